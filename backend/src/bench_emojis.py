@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""Offline benchmark of emoji quality and latency over a corpus of messages, alone or as conversation turns."""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import math
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from config import settings
+from conversation import Conversation
+from llm_client import LLMClient, llm_client
+from prompts import EMOJI_PROMPT, CONVERSATION_PROMPT, CONVERSATION_TURN_PROMPT
+from transport import RecordingTransport, ReplayTransport
+
+# Ollama responses of the corpus item being processed
+_responses: contextvars.ContextVar[Optional[List[Dict[str, Any]]]] = contextvars.ContextVar(
+    "responses", default=None
+)
+
+# Response fields kept in the results. The context is large and not needed to inspect a response.
+RESPONSE_FIELDS = (
+    "model", "response", "done", "done_reason", "total_duration", "load_duration",
+    "prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration",
+)
+
+# Summary fields shown when comparing two runs, with the direction that is better
+COMPARED_FIELDS = [
+    ("latency_ms.p50", "lower"),
+    ("latency_ms.p95", "lower"),
+    ("latency_ms.p99", "lower"),
+    ("output_tokens.mean", "lower"),
+    ("fallback_rate", "lower"),
+    ("degraded_rate", "lower"),
+    ("parse_failure_rate", "lower"),
+    ("llm_error_rate", "lower"),
+    ("agreement.mean_jaccard", "higher"),
+    ("agreement.hit_rate", "higher"),
+]
+
+
+class CapturingClient:
+    """Wraps an Ollama client and records each response for the corpus item that caused it."""
+
+    def __init__(self, client):
+        self._client = client
+
+    async def generate(self, **kwargs):
+        response = await self._client.generate(**kwargs)
+        responses = _responses.get()
+        if responses is not None and response:
+            responses.append({field: response.get(field) for field in RESPONSE_FIELDS})
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def load_corpus(path: str) -> List[Dict[str, Any]]:
+    """Read a JSONL corpus of {"message": str, "reference": [emoji, ...]} objects. The reference is optional."""
+    corpus = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not isinstance(item.get("message"), str):
+                raise ValueError(f"{path}:{number}: missing message")
+            corpus.append(item)
+    return corpus
+
+
+def normalize(emoji: str) -> str:
+    """Emoji without variation selectors, so that e.g. ☀ and ☀️ compare equal."""
+    return emoji.replace("\ufe0f", "").replace("\ufe0e", "")
+
+
+def percentile(values: Sequence[float], percentile: float) -> Optional[float]:
+    """Nearest-rank percentile, or None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = math.ceil(percentile / 100 * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def mean(values: Sequence[float]) -> Optional[float]:
+    return sum(values) / len(values) if values else None
+
+
+async def run_item(item: Dict[str, Any], slots: asyncio.Semaphore) -> Dict[str, Any]:
+    """Generate emojis for one corpus message and score the result."""
+    message = item["message"]
+    responses: List[Dict[str, Any]] = []
+    async with slots:
+        _responses.set(responses)
+        start = time.perf_counter()
+        emojis, degraded = await llm_client.generate_emojis(message)
+        latency = time.perf_counter() - start
+
+    return score(item, EMOJI_PROMPT.render(message), emojis, degraded, latency, responses)
+
+
+async def run_session(number: int, items: List[Dict[str, Any]], slots: asyncio.Semaphore) -> List[Dict[str, Any]]:
+    """
+    Send corpus messages as the turns of one conversation and score each turn.
+
+    The first turn, and any turn after the context was dropped, seeds the
+    context with the instructions and earlier messages. The other turns only
+    send the new message, so their input tokens show what the context saves.
+    """
+    conversation = Conversation(f"bench-{number}", settings.conversation_max_messages,
+                                settings.conversation_max_context_tokens, settings.conversation_max_bytes)
+    results = []
+    async with slots:
+        for turn, item in enumerate(items, start=1):
+            responses: List[Dict[str, Any]] = []
+            _responses.set(responses)
+            seeding = conversation.context is None
+            template = CONVERSATION_PROMPT if seeding else CONVERSATION_TURN_PROMPT
+            start = time.perf_counter()
+            emojis, degraded = await llm_client.generate_emojis_in_context(item["message"], conversation)
+            latency = time.perf_counter() - start
+
+            result = score(item, template.key, emojis, degraded, latency, responses)
+            result.update({"session": number, "turn": turn, "seeded": seeding and not degraded})
+            results.append(result)
+    return results
+
+
+def score(item: Dict[str, Any], prompt: str, emojis: List[str], degraded: bool, latency: float,
+          responses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The result of one corpus message, scored against its reference emojis."""
+    message = item["message"]
+    raw = responses[-1]["response"] if responses and responses[-1].get("response") is not None else None
+    if raw is None:
+        outcome = "llm_error"
+    elif not llm_client._extract_emojis(raw):
+        outcome = "parse_failure"
+    else:
+        outcome = "ok"
+
+    result = {
+        "message": message,
+        "prompt": prompt,
+        "emojis": emojis,
+        "degraded": degraded,
+        "outcome": outcome,
+        "latency_ms": round(latency * 1000, 3),
+        "input_tokens": sum(response.get("prompt_eval_count") or 0 for response in responses),
+        "output_tokens": sum(response.get("eval_count") or 0 for response in responses),
+        "responses": responses,
+    }
+
+    reference = item.get("reference")
+    # Heuristic emojis say nothing about the model's quality, so only LLM answers are scored
+    if reference and not degraded:
+        generated = {normalize(emoji) for emoji in emojis}
+        expected = {normalize(emoji) for emoji in reference}
+        result["reference"] = reference
+        result["jaccard"] = round(len(generated & expected) / len(generated | expected), 4)
+        result["hit"] = bool(generated & expected)
+    return result
+
+
+def summarize(items: List[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+    latencies = [item["latency_ms"] for item in items]
+    answered = [item for item in items if not item["degraded"]]
+    output_tokens = [item["output_tokens"] for item in answered]
+    input_tokens = [item["input_tokens"] for item in answered]
+    scored = [item for item in items if "jaccard" in item]
+    count = len(items)
+    turns = [item for item in items if "turn" in item]
+
+    def rate(outcome: str) -> float:
+        return sum(item["outcome"] == outcome for item in items) / count if count else 0.0
+
+    def rounded(value: Optional[float], digits: int = 3) -> Optional[float]:
+        return round(value, digits) if value is not None else None
+
+    summary = {
+        "messages": count,
+        "wall_time_s": round(wall_time, 3),
+        "throughput_per_s": round(count / wall_time, 3) if wall_time else None,
+        "latency_ms": {
+            "mean": rounded(mean(latencies)),
+            **{f"p{p}": rounded(percentile(latencies, p)) for p in (50, 90, 95, 99)},
+            "max": rounded(max(latencies, default=None)),
+        },
+        "input_tokens": {"mean": rounded(mean(input_tokens), 1), "total": sum(input_tokens)},
+        "output_tokens": {"mean": rounded(mean(output_tokens), 1), "total": sum(output_tokens)},
+        "emojis_per_message": rounded(mean([len(item["emojis"]) for item in items]), 2),
+        "fallback_rate": round(rate("parse_failure") + rate("llm_error"), 4),
+        "parse_failure_rate": round(rate("parse_failure"), 4),
+        "llm_error_rate": round(rate("llm_error"), 4),
+        "degraded_rate": round(sum(item["degraded"] for item in items) / count, 4) if count else 0.0,
+        "agreement": {
+            "scored": len(scored),
+            "mean_jaccard": rounded(mean([item["jaccard"] for item in scored]), 4),
+            "hit_rate": rounded(mean([float(item["hit"]) for item in scored]), 4),
+        },
+    }
+    if turns:
+        answered_turns = [item for item in turns if not item["degraded"]]
+        seeded = [item for item in answered_turns if item["seeded"]]
+        continued = [item for item in answered_turns if not item["seeded"]]
+        summary["conversation"] = {
+            "sessions": len({item["session"] for item in turns}),
+            "seeded_rate": round(len(seeded) / len(answered_turns), 4) if answered_turns else None,
+            "seeded_input_tokens": rounded(mean([item["input_tokens"] for item in seeded]), 1),
+            "continued_input_tokens": rounded(mean([item["input_tokens"] for item in continued]), 1),
+        }
+    return summary
+
+
+def lookup(summary: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = summary
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def print_summary(summary: Dict[str, Any]):
+    latency = summary["latency_ms"]
+    agreement = summary["agreement"]
+    print(f"messages            {summary['messages']} in {summary['wall_time_s']} s "
+          f"({summary['throughput_per_s']}/s)")
+    print(f"latency ms          mean {latency['mean']}  p50 {latency['p50']}  p90 {latency['p90']}  "
+          f"p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    print(f"tokens              input {summary['input_tokens']['mean']}/msg  "
+          f"output {summary['output_tokens']['mean']}/msg")
+    print(f"fallback rate       {summary['fallback_rate']:.1%} "
+          f"(parse failures {summary['parse_failure_rate']:.1%}, LLM errors {summary['llm_error_rate']:.1%})")
+    print(f"degraded rate       {summary['degraded_rate']:.1%} answered by the heuristic engine, "
+          f"excluded from token and agreement stats")
+    if agreement["scored"]:
+        print(f"reference agreement mean Jaccard {agreement['mean_jaccard']:.3f}, "
+              f"any overlap {agreement['hit_rate']:.1%} ({agreement['scored']} scored)")
+    conversation = summary.get("conversation")
+    if conversation:
+        seeded_rate = conversation["seeded_rate"] or 0.0
+        print(f"conversation        {conversation['sessions']} sessions, "
+              f"{seeded_rate:.1%} of LLM turns seeded the context")
+        print(f"input tokens/turn   seeding {conversation['seeded_input_tokens']}  "
+              f"continuing {conversation['continued_input_tokens']}")
+
+
+def print_comparison(baseline: Dict[str, Any], current: Dict[str, Any]):
+    print(f"\n{'metric':<24} {'baseline':>12} {'current':>12} {'change':>10}")
+    for path, better in COMPARED_FIELDS:
+        before, after = lookup(baseline["summary"], path), lookup(current["summary"], path)
+        if before is None or after is None:
+            continue
+        change = after - before
+        verdict = ""
+        if change:
+            verdict = "better" if (change < 0) == (better == "lower") else "worse"
+        print(f"{path:<24} {before:>12g} {after:>12g} {change:>+10.4g} {verdict}")
+
+
+async def run(args) -> Dict[str, Any]:
+    # Every message should reach the model: without this, an outage or a slow run would open the
+    # circuit breaker or trip degraded mode, and the rest of the corpus would never be sent
+    llm_client.swap_instance(LLMClient(settings.current_instance().model_copy(update={
+        "llm_circuit_failure_threshold": sys.maxsize,
+        "degraded_max_queue_wait": 0,
+        "degraded_latency_slo_ms": 0,
+    })))
+    client, hedge_client = llm_client.client, llm_client.hedge_client
+    shared_hedge = hedge_client is client
+    backend = llm_client.base_url
+    transport = None
+    if args.replay:
+        transport = ReplayTransport(args.replay, args.time_scale)
+        backend = f"replay:{args.replay}"
+    elif args.record:
+        transport = RecordingTransport(args.record)
+    if transport is not None:
+        client = transport.wrap(client)
+        hedge_client = client if shared_hedge else transport.wrap(hedge_client)
+    llm_client.client = CapturingClient(client)
+    llm_client.hedge_client = llm_client.client if shared_hedge else CapturingClient(hedge_client)
+
+    corpus = load_corpus(args.corpus) * args.repeat
+    slots = asyncio.Semaphore(args.concurrency)
+    start = time.perf_counter()
+    try:
+        if args.conversation:
+            sessions = [corpus[i:i + args.conversation] for i in range(0, len(corpus), args.conversation)]
+            results = await asyncio.gather(*(run_session(number, turns, slots)
+                                             for number, turns in enumerate(sessions, start=1)))
+            items = [item for session in results for item in session]
+        else:
+            items = await asyncio.gather(*(run_item(item, slots) for item in corpus))
+    finally:
+        if transport is not None:
+            transport.close()
+    wall_time = time.perf_counter() - start
+
+    return {
+        "run": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "label": args.label,
+            "backend": backend,
+            "model": llm_client.model,
+            "temperature": llm_client.temperature,
+            "max_tokens": llm_client.max_tokens,
+            "prompt": CONVERSATION_TURN_PROMPT.key if args.conversation else EMOJI_PROMPT.key,
+            "hedging": llm_client.hedge_policy is not None,
+            "corpus": args.corpus,
+            "repeat": args.repeat,
+            "concurrency": args.concurrency,
+            "conversation_turns": args.conversation,
+        },
+        "summary": summarize(items, wall_time),
+        "items": items,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        epilog="The model, temperature and max tokens are taken from the usual LLM_* environment variables."
+    )
+    parser.add_argument("--corpus", default="bench_corpus.jsonl", help="JSONL file of messages and reference emojis")
+    parser.add_argument("-o", "--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", metavar="RESULTS", help="Compare the summary with an earlier results file")
+    sources = parser.add_mutually_exclusive_group()
+    sources.add_argument("--record", metavar="RECORDING", help="Also record the LLM requests and responses to this file")
+    sources.add_argument("--replay", metavar="RECORDING",
+                         help="Answer from a recording instead of the Ollama server")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Multiply recorded latencies by this factor when replaying, 0 to answer immediately")
+    parser.add_argument("-c", "--concurrency", type=int, default=1,
+                        help="Messages processed in parallel, or conversations with --conversation")
+    parser.add_argument("--conversation", type=int, metavar="TURNS", default=0,
+                        help="Send the corpus as conversations of this many consecutive messages, "
+                             "each continuing from the earlier turns' context")
+    parser.add_argument("-r", "--repeat", type=int, default=1, help="Times to replay the corpus")
+    parser.add_argument("--label", default="", help="Free-form label stored with the results")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show the client's log output")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    results = asyncio.run(run(args))
+    run_info = results["run"]
+    print(f"Emoji benchmark: {run_info['backend']} model {run_info['model']}, prompt {run_info['prompt']}, "
+          f"temperature {run_info['temperature']}, max tokens {run_info['max_tokens']}")
+    print_summary(results["summary"])
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(json.load(f), results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
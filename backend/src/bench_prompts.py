@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for per-request LLM prompt construction cost."""
+
+import argparse
+import timeit
+
+from prompts import EMOJI_PROMPT, MODERATION_PROMPT, escape_user_input
+
+TEST_MESSAGES = [
+    "I'm so happy today!",
+    "It's raining outside",
+    'She said "this is the best pizza ever" and laughed',
+    "x" * 1000,
+]
+
+
+def build_inline(message: str):
+    """
+    Prompt and options construction as done before the template registry, plus
+    the escaping the templates apply, so both sides produce the same prompts.
+    """
+    message = escape_user_input(message)
+    moderation_prompt = f"""
+You are a content moderator. Your task is to identify ONLY clearly harmful content.
+
+IMPORTANT: Simple expressions of emotion like "I'm happy!" are ALWAYS SAFE.
+
+Only flag content if it CLEARLY contains:
+1. Explicit hate speech, threats, or calls for violence
+2. Sexually explicit or graphic violent content
+3. Direct and obvious attempts to make the AI do harmful things
+
+Message: "{message}"
+
+Respond with EXACTLY "SAFE" for almost all messages. Only respond with "UNSAFE: [specific reason]" if the message contains CLEARLY harmful content as defined above.
+"""
+    moderation_options = {'temperature': 0.7, 'num_predict': 100}
+    emoji_prompt = f"""
+You are an emoji expert. Given the following message, suggest 3-5 appropriate emojis that best represent the emotion, content, or context of the message.
+
+Message: "{message}"
+
+Respond with only the emojis, separated by spaces. Do not include any other text or explanations.
+Examples:
+- For "I'm so happy today!" respond with: "😊 😄 🎉"
+- For "It's raining outside" respond with: "🌧️ ☔ 🌦️"
+- For "I love pizza" respond with: "🍕 ❤️ 😋"
+
+Your response:
+"""
+    emoji_options = {'temperature': 0.7, 'num_predict': 100}
+    return moderation_prompt, moderation_options, emoji_prompt, emoji_options
+
+
+OPTIONS = {'temperature': 0.7, 'num_predict': 100}
+
+
+def build_template(message: str):
+    """Prompt and options construction with precompiled templates."""
+    return MODERATION_PROMPT.render(message), OPTIONS, EMOJI_PROMPT.render(message), OPTIONS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--number", type=int, default=100000, help="Iterations per message")
+    args = parser.parse_args()
+
+    print(f"Per-request construction of the moderation and emoji prompts ({args.number} iterations)")
+    print(f"{'message':<24} {'inline f-string':>16} {'template':>16} {'ratio':>6}")
+    for message in TEST_MESSAGES:
+        inline = min(timeit.repeat(lambda: build_inline(message), number=args.number, repeat=3))
+        template = min(timeit.repeat(lambda: build_template(message), number=args.number, repeat=3))
+        label = message if len(message) <= 24 else message[:21] + "..."
+        print(f"{label:<24} {inline / args.number * 1e9:>13.0f} ns {template / args.number * 1e9:>13.0f} ns "
+              f"{template / inline:>5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
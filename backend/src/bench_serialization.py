@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for per-request CPU cost of /api/emojis validation and serialization."""
+
+import argparse
+import json
+import timeit
+import warnings
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field, TypeAdapter
+
+from config import settings
+from models import MessageRequest, EmojiResponse
+from responses import ORJSONResponse
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from pydantic import validator
+
+    class LegacyMessageRequest(BaseModel):
+        """MessageRequest as it was with a v1-style validator."""
+
+        message: str = Field(..., min_length=settings.min_message_length, max_length=settings.max_message_length)
+        disable_moderation: bool = Field(False)
+
+        @validator('message')
+        def validate_message(cls, v):
+            if not v or not v.strip():
+                raise ValueError("Message cannot be empty or only whitespace")
+            if len(v.strip()) < settings.min_message_length:
+                raise ValueError(f"Message too short. Minimum length: {settings.min_message_length}")
+            return v.strip()
+
+
+REQUEST_BODY = json.dumps({"message": "I love pizza on a sunny day with friends!", "disable_moderation": False})
+EMOJIS: List[str] = ["🍕", "☀️", "😋", "👫", "❤️"]
+
+
+def response_fields(message: str, moderation_passed: Optional[bool]) -> Dict[str, Any]:
+    """The fields of an EmojiResponse, as process_message returns them."""
+    return {"emojis": EMOJIS, "message": message, "moderation_passed": moderation_passed, "degraded": False}
+
+
+def legacy_request(body: str) -> LegacyMessageRequest:
+    return LegacyMessageRequest(**json.loads(body))
+
+
+EMOJI_RESPONSE = TypeAdapter(EmojiResponse)
+
+
+def model_response(message: str, moderation_passed: Optional[bool]) -> bytes:
+    """
+    Validation against the response model and Pydantic's dump_json, as FastAPI
+    serializes a route with a response model and no custom response class.
+    """
+    return EMOJI_RESPONSE.dump_json(EMOJI_RESPONSE.validate_python(response_fields(message, moderation_passed)))
+
+
+def fast_request(body: str) -> MessageRequest:
+    return MessageRequest.model_validate(json.loads(body))
+
+
+def fast_response(message: str, moderation_passed: Optional[bool]) -> bytes:
+    """Dict built from validated values, serialized with orjson."""
+    return ORJSONResponse(response_fields(message, moderation_passed)).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--number", type=int, default=20000, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    message = fast_request(REQUEST_BODY).message
+    assert json.loads(model_response(message, True)) == json.loads(fast_response(message, True))
+
+    measurements = [
+        ("request validation", lambda: legacy_request(REQUEST_BODY), lambda: fast_request(REQUEST_BODY)),
+        ("response serialization", lambda: model_response(message, True), lambda: fast_response(message, True)),
+    ]
+
+    print(f"Per-request CPU cost ({args.number} iterations)")
+    print(f"{'step':<24} {'before':>12} {'after':>12}")
+    totals = [0.0, 0.0]
+    for name, before, after in measurements:
+        results = [min(timeit.repeat(function, number=args.number, repeat=3)) / args.number * 1e6
+                   for function in (before, after)]
+        totals = [total + result for total, result in zip(totals, results)]
+        print(f"{name:<24} {results[0]:>9.2f} us {results[1]:>9.2f} us")
+    print(f"{'total':<24} {totals[0]:>9.2f} us {totals[1]:>9.2f} us")
+
+
+if __name__ == "__main__":
+    main()
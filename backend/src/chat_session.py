@@ -0,0 +1,190 @@
+"""WebSocket chat sessions with pipelined moderation and emoji generation."""
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Set
+
+import orjson
+from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from models import ChatSocketMessage
+from llm_client import LLMClient, llm_client, ModerationUnavailableError
+from conversation import conversations
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+class ChatSession:
+    """
+    A single long-lived chat connection.
+
+    Incoming messages are queued in a bounded queue and processed by up to
+    `max_concurrent` tasks at a time. When the queue is full the session stops
+    reading from the socket, so a fast client is slowed down by TCP backpressure
+    instead of growing the server's memory. Every frame sent back is tagged with
+    the client's message ID, so results may arrive out of order.
+
+    Server frames:
+        {"type": "session", "max_concurrent": int, "max_pending": int}
+        {"type": "accepted", "id": str}
+        {"type": "emoji", "id": str, "emoji": str}
+        {"type": "result", "id": str, "emojis": [str], "message": str, "moderation_passed": bool | null,
+         "degraded": bool}
+        {"type": "error", "id": str | null, "detail": str}
+    """
+
+    def __init__(self, websocket: WebSocket, max_concurrent: int, max_pending: int):
+        self.websocket = websocket
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_pending = max(1, max_pending)
+        self._pending: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self._send_lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def run(self):
+        """Serve the connection until the client disconnects."""
+        dispatcher = asyncio.create_task(self._dispatch())
+        try:
+            await self._send({
+                "type": "session",
+                "max_concurrent": self.max_concurrent,
+                "max_pending": self.max_pending,
+            })
+            while True:
+                data = await self.websocket.receive_text()
+                request = await self._parse(data)
+                if request is not None:
+                    # Blocks while the queue is full, which stops us reading from the socket
+                    await self._pending.put(request)
+        except WebSocketDisconnect:
+            logger.info("Chat WebSocket disconnected")
+        except Exception as e:
+            logger.error(f"Chat WebSocket error: {str(e)}", exc_info=True)
+        finally:
+            dispatcher.cancel()
+            for task in list(self._tasks):
+                task.cancel()
+            await asyncio.gather(dispatcher, *self._tasks, return_exceptions=True)
+
+    async def _parse(self, data: str) -> Optional[ChatSocketMessage]:
+        """Parse and validate a client frame, reporting problems back to the client."""
+        try:
+            payload = orjson.loads(data)
+        except orjson.JSONDecodeError:
+            await self._send_error(None, "Invalid JSON")
+            return None
+
+        try:
+            return ChatSocketMessage.model_validate(payload)
+        except ValidationError as e:
+            message_id = payload.get("id") if isinstance(payload, dict) else None
+            detail = "; ".join(error["msg"] for error in e.errors())
+            await self._send_error(message_id, f"Invalid message: {detail}")
+            return None
+
+    async def _dispatch(self):
+        """Start a processing task for each queued message as soon as a slot is free."""
+        while True:
+            request = await self._pending.get()
+            await self._slots.acquire()
+            task = asyncio.create_task(self._process(request))
+            self._tasks.add(task)
+            task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        self._slots.release()
+
+    async def _process(self, request: ChatSocketMessage):
+        """
+        Moderate a message and stream its emojis back to the client.
+
+        Generation starts immediately, in parallel with moderation, but nothing
+        is sent to the client until the message has passed moderation. Messages
+        of a conversation session are only generated after moderation.
+        """
+        # Moderation and generation use the same client, even if the settings are reloaded in between,
+        # and the client is not closed by a reload until both are done
+        with tracer.start_span("websocket message", kind="SERVER", attributes={"message.id": request.id}), \
+                llm_client.current_instance().in_use() as client:
+            await self._process_traced(request, client)
+
+    async def _process_traced(self, request: ChatSocketMessage, client: LLMClient):
+        message_id = request.id
+        emoji_queue: asyncio.Queue = asyncio.Queue()
+        moderated = asyncio.Event()
+        degraded = False
+
+        async def produce():
+            nonlocal degraded
+            try:
+                if request.session_id:
+                    # A turn is recorded in the conversation, so wait until the message
+                    # has passed moderation. Its emojis are not streamed but arrive together.
+                    await moderated.wait()
+                    conversation = conversations.get(request.session_id)
+                    emojis, degraded = await client.generate_emojis_in_context(request.message, conversation)
+                    for emoji in emojis:
+                        await emoji_queue.put(emoji)
+                else:
+                    async for emoji, emoji_degraded in client.stream_emojis(request.message):
+                        degraded = degraded or emoji_degraded
+                        await emoji_queue.put(emoji)
+            finally:
+                await emoji_queue.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            await self._send({"type": "accepted", "id": message_id})
+
+            moderation_passed = None
+            if not request.disable_moderation:
+                try:
+                    is_safe, reason = await client.moderate_content(request.message)
+                except ModerationUnavailableError as e:
+                    if not client.moderation_fail_open:
+                        await self._send_error(
+                            message_id, "Content moderation is temporarily unavailable, please try again later"
+                        )
+                        return
+                    logger.warning(f"{str(e)}, serving message {message_id} unmoderated")
+                else:
+                    logger.info(f"Moderation result for {message_id}: safe={is_safe}, reason={reason}")
+                    if not is_safe:
+                        await self._send_error(message_id, f"Message failed content moderation: {reason}")
+                        return
+                    moderation_passed = True
+            moderated.set()
+
+            emojis = []
+            while (emoji := await emoji_queue.get()) is not None:
+                emojis.append(emoji)
+                await self._send({"type": "emoji", "id": message_id, "emoji": emoji})
+
+            await self._send({
+                "type": "result",
+                "id": message_id,
+                "emojis": emojis,
+                "message": request.message,
+                "moderation_passed": moderation_passed,
+                "degraded": degraded,
+            })
+        except Exception as e:
+            logger.error(f"Error processing WebSocket message {message_id}: {str(e)}", exc_info=True)
+            try:
+                await self._send_error(message_id, "Failed to generate emojis")
+            except Exception:
+                pass
+        finally:
+            producer.cancel()
+
+    async def _send_error(self, message_id: Optional[str], detail: str):
+        await self._send({"type": "error", "id": message_id, "detail": detail})
+
+    async def _send(self, frame: Dict[str, Any]):
+        # Frames from concurrent tasks must not interleave on the socket
+        async with self._send_lock:
+            await self.websocket.send_text(orjson.dumps(frame).decode())
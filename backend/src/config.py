@@ -1,8 +1,16 @@
 """Configuration settings for the emoji chat backend."""
 
+import logging
 import os
+from typing import Any, Generic, TypeVar
+
+from dotenv import dotenv_values
 from pydantic_settings import BaseSettings
 
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
@@ -13,8 +21,33 @@ class Settings(BaseSettings):
     llm_temperature: float = float(os.getenv("LLM_TEMPERATURE", "0.7"))
     llm_max_tokens: int = int(os.getenv("LLM_MAX_TOKENS", "100"))
 
+    # Hedged requests: duplicate slow LLM calls to another (or the same) backend
+    llm_hedge_enabled: bool = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+    llm_hedge_url: str = os.getenv("LLM_HEDGE_URL", "")  # Use LLM_URL if empty
+    llm_hedge_percentile: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+    llm_hedge_budget: float = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+    llm_hedge_min_delay_ms: int = int(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "200"))
+
+    # Circuit breaker: stop calling a failing LLM server for a while
+    llm_circuit_failure_threshold: int = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+    llm_circuit_reset_timeout: float = float(os.getenv("LLM_CIRCUIT_RESET_TIMEOUT", "30"))
+
+    # Degraded mode: serve heuristic emojis when the LLM path would be too slow (0 disables a check)
+    degraded_max_queue_wait: float = float(os.getenv("DEGRADED_MAX_QUEUE_WAIT", "10"))
+    degraded_latency_slo_ms: int = int(os.getenv("DEGRADED_LATENCY_SLO_MS", "0"))
+    degraded_latency_percentile: float = float(os.getenv("DEGRADED_LATENCY_PERCENTILE", "95"))
+    degraded_probe_fraction: float = float(os.getenv("DEGRADED_PROBE_FRACTION", "0.1"))
+    degraded_latency_window_seconds: float = float(os.getenv("DEGRADED_LATENCY_WINDOW_SECONDS", "60"))
+
+    # LLM transport: passthrough, record (to LLM_TRANSPORT_FILE) or replay (from it, without an LLM server)
+    llm_transport: str = os.getenv("LLM_TRANSPORT", "passthrough")
+    llm_transport_file: str = os.getenv("LLM_TRANSPORT_FILE", "llm_recording.jsonl")
+    llm_replay_time_scale: float = float(os.getenv("LLM_REPLAY_TIME_SCALE", "1.0"))
+
     # Content moderation settings
     moderation_model: str = os.getenv("MODERATION_MODEL", "")  # Use same model as main if empty
+    # When the LLM cannot moderate, or degraded mode skips it: reject (503) or allow (serve the message unmoderated)
+    moderation_unavailable_policy: str = os.getenv("MODERATION_UNAVAILABLE_POLICY", "reject")
 
     # Message validation settings
     max_message_length: int = int(os.getenv("MAX_MESSAGE_LENGTH", "1000"))
@@ -27,16 +60,106 @@ class Settings(BaseSettings):
     # API settings
     api_timeout: int = int(os.getenv("API_TIMEOUT", "30"))
 
+    # Conversation memory settings
+    conversation_max_sessions: int = int(os.getenv("CONVERSATION_MAX_SESSIONS", "1000"))
+    conversation_max_messages: int = int(os.getenv("CONVERSATION_MAX_MESSAGES", "10"))
+    conversation_max_context_tokens: int = int(os.getenv("CONVERSATION_MAX_CONTEXT_TOKENS", "2048"))
+    conversation_max_bytes: int = int(os.getenv("CONVERSATION_MAX_BYTES", "32768"))
+    conversation_idle_timeout: float = float(os.getenv("CONVERSATION_IDLE_TIMEOUT", "1800"))
+
+    # Asynchronous job queue settings
+    job_workers: int = int(os.getenv("JOB_WORKERS", "2"))
+    job_queue_max_size: int = int(os.getenv("JOB_QUEUE_MAX_SIZE", "100"))
+    job_result_ttl: float = float(os.getenv("JOB_RESULT_TTL", "300"))
+    job_max_wait: float = float(os.getenv("JOB_MAX_WAIT", "30"))
+
+    # Readiness probe settings
+    readiness_probe_interval: float = float(os.getenv("READINESS_PROBE_INTERVAL", "15"))
+    readiness_probe_timeout: float = float(os.getenv("READINESS_PROBE_TIMEOUT", "10"))
+    readiness_max_staleness: float = float(os.getenv("READINESS_MAX_STALENESS", "60"))
+    # Stay ready while the LLM is down, as emojis can still be served by the heuristic engine.
+    # Only with MODERATION_UNAVAILABLE_POLICY=allow: otherwise moderated messages are rejected while it is down.
+    readiness_serve_degraded: bool = os.getenv("READINESS_SERVE_DEGRADED", "true").lower() == "true"
+
+    # WebSocket settings
+    ws_max_concurrent_messages: int = int(os.getenv("WS_MAX_CONCURRENT_MESSAGES", "4"))
+    ws_max_pending_messages: int = int(os.getenv("WS_MAX_PENDING_MESSAGES", "16"))
+
+    # Tracing settings
+    tracing_exporter: str = os.getenv("TRACING_EXPORTER", "none")  # none, console, file or otlp
+    tracing_file: str = os.getenv("TRACING_FILE", "traces.jsonl")
+    tracing_service_name: str = os.getenv("TRACING_SERVICE_NAME", "emoji-chat-backend")
+
+    # LLM usage accounting settings
+    usage_model_load_threshold_ms: float = float(os.getenv("USAGE_MODEL_LOAD_THRESHOLD_MS", "100"))
+    usage_max_clients: int = int(os.getenv("USAGE_MAX_CLIENTS", "1000"))
+
     # Development settings
     development_mode: bool = os.getenv("DEVELOPMENT_MODE", "false").lower() == "true"
 
     # Logging settings
     log_level: str = os.getenv("LOG_LEVEL", "INFO").upper()
 
+    # Runtime reload: KEY=value file that overrides the environment, re-read on reload
+    config_file: str = os.getenv("CONFIG_FILE", "")
+    config_watch_interval: float = float(os.getenv("CONFIG_WATCH_INTERVAL", "10"))  # 0 disables the file watch
+    admin_token: str = os.getenv("ADMIN_TOKEN", "")  # Required by admin endpoints, which are disabled if unset
+
     class Config:
         env_file = ".env"
         case_sensitive = False
 
 
-# Global settings instance
-settings = Settings()
+def load_settings(config_file: str = "") -> Settings:
+    """
+    Load the settings from the environment and `.env`, overridden by the
+    KEY=value lines of `config_file` if given.
+
+    Raises:
+        OSError: If the config file cannot be read
+        ValidationError: If a value is invalid
+    """
+    overrides = {}
+    if config_file:
+        if not os.path.isfile(config_file):
+            raise FileNotFoundError(f"Config file {config_file} not found")
+        for key, value in dotenv_values(config_file).items():
+            name = key.lower()
+            if name not in Settings.model_fields:
+                logger.warning(f"Ignoring unknown setting {key} in {config_file}")
+            elif value is not None:
+                overrides[name] = value
+    return Settings(**overrides)
+
+
+class Current(Generic[T]):
+    """
+    Proxy to the current instance of an object that is replaced on reload.
+
+    Modules import the proxy once, and every attribute lookup goes to the
+    instance that is current at that moment. A method looked up before a
+    swap keeps running on the old instance, so work in flight finishes on
+    the snapshot it started with.
+    """
+
+    def __init__(self, instance: T):
+        object.__setattr__(self, "_instance", instance)
+
+    def current_instance(self) -> T:
+        return self._instance
+
+    def swap_instance(self, instance: T) -> T:
+        """Make `instance` current and return the previous one."""
+        previous = self._instance
+        object.__setattr__(self, "_instance", instance)
+        return previous
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._instance, name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self._instance, name, value)
+
+
+# Global settings, swapped as a whole when they are reloaded
+settings: Current[Settings] = Current(load_settings(os.getenv("CONFIG_FILE", "")))
@@ -0,0 +1,137 @@
+"""Reloading the settings at runtime, from a config file, an admin request or SIGHUP."""
+
+import asyncio
+import logging
+import os
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from config import Settings, load_settings, settings
+from metrics import metrics
+from models import ConfigReloadResponse
+
+logger = logging.getLogger(__name__)
+
+config_version = metrics.gauge("config_version", "Version of the settings in use, incremented on every change")
+config_reloads_total = metrics.counter(
+    "config_reloads_total",
+    "Configuration reloads, by what triggered them and their outcome",
+    ["trigger", "outcome"]
+)
+
+# Builds whatever depends on the new settings and returns a function that puts it in use.
+# Raising rejects the reload before anything has changed.
+Prepare = Callable[[Settings], Callable[[], None]]
+
+
+class ConfigReloader:
+    """
+    Reloads the settings and rebuilds the components that depend on them.
+
+    Components subscribe with the settings they read. On a reload, the new
+    settings are loaded and compared with the current ones, and each
+    subscriber whose settings changed prepares its new state. Only when all
+    of them have succeeded are the settings and the new components swapped
+    in, so a reload applies completely or not at all. Changed settings that
+    no subscriber covers are reported as needing a restart.
+
+    When `watch_interval` is positive, the config file is checked for changes
+    that often and reloaded automatically.
+    """
+
+    def __init__(self, config_file: str, watch_interval: float):
+        self.config_file = config_file
+        self.watch_interval = watch_interval
+        self.version = 1
+        self._subscribers: List[Tuple[Set[str], Optional[Prepare]]] = []
+        self._lock = asyncio.Lock()
+        self._mtime = self._file_mtime()
+        self._task: Optional[asyncio.Task] = None
+
+        config_version.set_function(lambda: self.version)
+
+    def subscribe(self, fields: Sequence[str], prepare: Optional[Prepare] = None):
+        """
+        Apply changes of `fields` live. Without `prepare`, the component reads
+        the settings on every use and needs nothing beyond the swap.
+        """
+        self._subscribers.append((set(fields), prepare))
+
+    def start(self):
+        """Start watching the config file, if there is one."""
+        if self._task is None and self.config_file and self.watch_interval > 0:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        """Stop watching the config file."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def reload(self, trigger: str) -> ConfigReloadResponse:
+        """
+        Load the settings again and apply the changes.
+
+        Raises:
+            Exception: If the settings cannot be loaded or a component rejects
+                them. The previous settings then stay in use.
+        """
+        async with self._lock:
+            try:
+                response = self._apply(load_settings(self.config_file))
+            except Exception as e:
+                logger.error(f"Configuration reload ({trigger}) failed, keeping the current settings: {e}")
+                config_reloads_total.inc(trigger=trigger, outcome="error")
+                raise
+
+        config_reloads_total.inc(trigger=trigger, outcome="changed" if response.changed else "unchanged")
+        if response.changed:
+            logger.info(f"Configuration reloaded ({trigger}) as version {response.version}, "
+                        f"changed: {', '.join(response.changed)}")
+        if response.restart_required:
+            logger.warning(f"Settings changed that only take effect after a restart: "
+                           f"{', '.join(response.restart_required)}")
+        return response
+
+    def _apply(self, new: Settings) -> ConfigReloadResponse:
+        current = settings.current_instance()
+        changed = [field for field in Settings.model_fields if getattr(new, field) != getattr(current, field)]
+        if not changed:
+            return ConfigReloadResponse(version=self.version, changed=[], restart_required=[])
+
+        # Prepare everything first, so a failure leaves the running configuration untouched
+        commits = []
+        live: Set[str] = set()
+        for fields, prepare in self._subscribers:
+            live |= fields
+            if prepare is not None and fields.intersection(changed):
+                commits.append(prepare(new))
+
+        settings.swap_instance(new)
+        for commit in commits:
+            commit()
+        self.version += 1
+        return ConfigReloadResponse(
+            version=self.version,
+            changed=changed,
+            restart_required=[field for field in changed if field not in live]
+        )
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.config_file).st_mtime if self.config_file else None
+        except OSError:
+            return None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            mtime = self._file_mtime()
+            if mtime is None or mtime == self._mtime:
+                continue
+            self._mtime = mtime
+            try:
+                await self.reload("file")
+            except Exception:
+                # Already logged, try again when the file changes next
+                pass
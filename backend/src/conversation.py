@@ -0,0 +1,171 @@
+"""Bounded, session-scoped conversation memory for context-aware emoji generation."""
+
+import asyncio
+import logging
+import time
+from array import array
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Sequence, Tuple
+
+from config import settings
+from metrics import metrics
+from models import ConversationStatsResponse
+
+logger = logging.getLogger(__name__)
+
+conversation_sessions = metrics.gauge("conversation_sessions", "Conversation sessions held in memory")
+conversation_memory_bytes = metrics.gauge(
+    "conversation_memory_bytes",
+    "Approximate memory held by all conversation sessions"
+)
+conversation_evictions_total = metrics.counter(
+    "conversation_evictions_total",
+    "Conversation sessions evicted from memory",
+    ["reason"]
+)
+conversation_context_resets_total = metrics.counter(
+    "conversation_context_resets_total",
+    "Times a session's LLM context was dropped for exceeding its token or memory cap"
+)
+
+
+class Conversation:
+    """
+    Recent messages of one chat session, plus the Ollama context that encodes them.
+
+    The context lets each turn send only the new message to Ollama instead of
+    the whole history. When the context grows past its caps it is dropped, and
+    the next turn re-seeds it from the recent messages. A context is only
+    meaningful to the model that produced it, so it is kept together with
+    its `context_source`.
+    """
+
+    def __init__(self, session_id: str, max_messages: int, max_context_tokens: int, max_bytes: int):
+        self.session_id = session_id
+        self.max_context_tokens = max_context_tokens
+        self.max_bytes = max_bytes
+        self.messages: Deque[Tuple[str, List[str]]] = deque(maxlen=max_messages)
+        self.context: Optional[array] = None
+        self.context_source: Optional[Tuple[str, str]] = None
+        self.turns = 0
+        self.last_used = time.monotonic()
+        # Turns build on each other's context, so they must not run concurrently
+        self.lock = asyncio.Lock()
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held: message text, emojis and context tokens."""
+        total = sum(len(message.encode("utf-8")) + sum(len(emoji.encode("utf-8")) for emoji in emojis)
+                    for message, emojis in self.messages)
+        if self.context is not None:
+            total += len(self.context) * self.context.itemsize
+        return total
+
+    def record(self, message: str, emojis: List[str], context: Optional[Sequence[int]],
+               source: Optional[Tuple[str, str]] = None):
+        """Record a finished turn and the context Ollama returned for it, from the (server, model) `source`."""
+        self.messages.append((message, list(emojis)))
+        self.context = array("i", context) if context else None
+        self.context_source = source if context else None
+        self.turns += 1
+
+        if self.context is not None and len(self.context) > self.max_context_tokens:
+            logger.info(f"Session {self.session_id} context has {len(self.context)} tokens, resetting")
+            self.context = None
+            conversation_context_resets_total.inc()
+
+        if self.memory_bytes() > self.max_bytes and self.context is not None:
+            logger.info(f"Session {self.session_id} exceeds {self.max_bytes} bytes, resetting context")
+            self.context = None
+            conversation_context_resets_total.inc()
+        # Keep at least the latest message, even if it alone is over the cap
+        while self.memory_bytes() > self.max_bytes and len(self.messages) > 1:
+            self.messages.popleft()
+
+    def reset_context(self):
+        """Drop the context, so the next turn re-seeds it from the recent messages."""
+        self.context = None
+        self.context_source = None
+
+
+class ConversationStore:
+    """
+    Conversations by session ID, kept in least recently used order.
+
+    Sessions idle for longer than `idle_timeout` seconds are evicted, as is the
+    least recently used session when `max_sessions` is reached.
+    """
+
+    def __init__(self, max_sessions: int, max_messages: int, max_context_tokens: int,
+                 max_bytes: int, idle_timeout: float):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.max_context_tokens = max_context_tokens
+        self.max_bytes = max_bytes
+        self.idle_timeout = idle_timeout
+        self._sessions: "OrderedDict[str, Conversation]" = OrderedDict()
+
+        conversation_sessions.set_function(lambda: len(self._sessions))
+        conversation_memory_bytes.set_function(self.memory_bytes)
+
+    def get(self, session_id: str) -> Conversation:
+        """Get the conversation for a session, creating it if needed."""
+        self._evict_idle()
+        conversation = self._sessions.get(session_id)
+        if conversation is None:
+            while len(self._sessions) >= self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                conversation_evictions_total.inc(reason="capacity")
+                logger.info(f"Evicted least recently used session {evicted.session_id}")
+            conversation = Conversation(session_id, self.max_messages, self.max_context_tokens, self.max_bytes)
+            self._sessions[session_id] = conversation
+        else:
+            self._sessions.move_to_end(session_id)
+        conversation.last_used = time.monotonic()
+        return conversation
+
+    def discard(self, session_id: str) -> bool:
+        """Forget a session. Returns whether it existed."""
+        return self._sessions.pop(session_id, None) is not None
+
+    def reset_contexts(self) -> int:
+        """Drop the context of every session. Returns how many had one."""
+        reset = 0
+        for conversation in self._sessions.values():
+            if conversation.context is not None:
+                conversation.reset_context()
+                reset += 1
+        return reset
+
+    def memory_bytes(self) -> int:
+        return sum(conversation.memory_bytes() for conversation in self._sessions.values())
+
+    def stats(self) -> ConversationStatsResponse:
+        self._evict_idle()
+        sizes = [conversation.memory_bytes() for conversation in self._sessions.values()]
+        return ConversationStatsResponse(
+            sessions=len(sizes),
+            memory_bytes=sum(sizes),
+            max_session_memory_bytes=max(sizes, default=0),
+            session_memory_cap_bytes=self.max_bytes,
+            max_sessions=self.max_sessions
+        )
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._sessions:
+            session_id, conversation = next(iter(self._sessions.items()))
+            # A session in the middle of a turn is not idle
+            if conversation.last_used > cutoff or conversation.lock.locked():
+                break
+            del self._sessions[session_id]
+            conversation_evictions_total.inc(reason="idle")
+
+
+# Global conversation store
+conversations = ConversationStore(
+    max_sessions=settings.conversation_max_sessions,
+    max_messages=settings.conversation_max_messages,
+    max_context_tokens=settings.conversation_max_context_tokens,
+    max_bytes=settings.conversation_max_bytes,
+    idle_timeout=settings.conversation_idle_timeout
+)
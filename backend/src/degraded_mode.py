@@ -0,0 +1,126 @@
+"""Circuit breaker and the policy for switching emoji generation to the heuristic engine."""
+
+import logging
+import time
+from typing import Callable, Optional
+
+from hedging import LatencyWindow
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+llm_circuit_open = metrics.gauge("llm_circuit_open", "Whether the LLM circuit breaker is open (1) or not (0)")
+llm_circuit_opened_total = metrics.counter("llm_circuit_opened_total", "Times the LLM circuit breaker opened")
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a failing LLM server.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    requests fail immediately. After `reset_timeout` seconds a single trial
+    request is let through: if it succeeds the circuit closes, otherwise it
+    stays open for another `reset_timeout`. A trial that never reports back,
+    e.g. because it was cancelled, is replaced by a new one after
+    `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        # Time the circuit opened, or its current trial started
+        self._opened_at: Optional[float] = None
+
+        llm_circuit_open.set_function(lambda: 1 if self._opened_at is not None else 0)
+
+    def is_open(self) -> bool:
+        """Whether requests are currently rejected, without claiming the trial request."""
+        return self._opened_at is not None and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now. Claims the trial request when one is due."""
+        if self.is_open():
+            return False
+        if self._opened_at is not None:
+            # Other requests are rejected while the trial runs
+            self._opened_at = time.monotonic()
+        return True
+
+    def record_success(self):
+        if self._opened_at is not None:
+            logger.info("LLM circuit breaker closed")
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self):
+        self._failures += 1
+        if self._opened_at is not None:
+            self._opened_at = time.monotonic()
+        elif self._failures >= self.failure_threshold:
+            logger.warning(f"LLM circuit breaker opened after {self._failures} consecutive failures")
+            llm_circuit_opened_total.inc()
+            self._opened_at = time.monotonic()
+
+
+class DegradedMode:
+    """
+    Decides when emoji generation should skip the LLM and use the heuristic engine.
+
+    The LLM path is skipped while the circuit breaker is open, while the
+    oldest queued job has waited longer than `max_queue_wait` seconds, and
+    while the `latency_percentile` of recent emoji generation latencies is
+    above `latency_slo` seconds. A zero limit disables that check. Only
+    latencies from the last `window_seconds` count. While the latency SLO
+    is breached, `probe_fraction` of requests still go to the LLM, so the
+    latency picture is refreshed and the switch back happens once the LLM
+    is fast again. Without probes, the breach ends once the slow latencies
+    have aged out of the window.
+    """
+
+    def __init__(self, breaker: CircuitBreaker, max_queue_wait: float, latency_slo: float,
+                 latency_percentile: float, probe_fraction: float, window_seconds: float = 60,
+                 window_size: int = 100, min_samples: int = 20):
+        self.breaker = breaker
+        self.max_queue_wait = max_queue_wait
+        self.latency_slo = latency_slo
+        self.latency_percentile = latency_percentile
+        self.probe_fraction = probe_fraction
+        self.min_samples = min_samples
+        self._latencies = LatencyWindow(window_size, max_age=window_seconds)
+        self._probe_credit = 0.0
+        self.queue_wait: Callable[[], float] = lambda: 0.0
+
+    def watch_queue(self, queue_wait: Callable[[], float]):
+        """Use `queue_wait()`, in seconds, as the queue wait signal."""
+        self.queue_wait = queue_wait
+
+    def observe(self, latency: float):
+        """Record the latency of a successful LLM emoji generation."""
+        self._latencies.add(latency)
+
+    def reason(self, probe: bool = True) -> Optional[str]:
+        """
+        Why the LLM path should be skipped for the next request, or None to use it.
+
+        With `probe=False` the request is never picked as a latency probe, and
+        the probe credit is left for emoji generation.
+        """
+        if self.breaker.is_open():
+            return "circuit_open"
+        if self.max_queue_wait > 0 and self.queue_wait() > self.max_queue_wait:
+            return "queue_wait"
+        if self.latency_slo > 0 and self._slo_breached():
+            if not probe:
+                return "latency_slo"
+            self._probe_credit += self.probe_fraction
+            if self._probe_credit >= 1:
+                self._probe_credit -= 1
+                return None
+            return "latency_slo"
+        return None
+
+    def _slo_breached(self) -> bool:
+        if len(self._latencies) < self.min_samples:
+            return False
+        return self._latencies.percentile(self.latency_percentile) > self.latency_slo
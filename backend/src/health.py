@@ -0,0 +1,139 @@
+"""Background readiness probing of the LLM server."""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from metrics import metrics
+from models import ReadinessResponse
+from usage import Caller, calls_for, usage_tracker
+
+logger = logging.getLogger(__name__)
+
+llm_ready = metrics.gauge(
+    "llm_ready",
+    "Whether the last readiness probe of the LLM server succeeded (1) or not (0)"
+)
+llm_readiness_probe_duration_seconds = metrics.histogram(
+    "llm_readiness_probe_duration_seconds",
+    "Duration of background readiness probes of the LLM server"
+)
+
+
+def _model_available(model: str, available: Iterable[str]) -> bool:
+    # Ollama lists untagged models with the implicit ":latest" tag
+    names = set(available)
+    return model in names or f"{model}:latest" in names
+
+
+class ReadinessProber:
+    """
+    Periodically checks that the LLM server is up and can generate.
+
+    Each probe lists the server's models, checks that the configured models are
+    present, and generates a single token. The result is cached, so the
+    readiness endpoint only reads it and never causes LLM work. The service
+    also reports not ready when the last probe result is older than
+    `max_staleness` seconds, which catches a hung prober or LLM call.
+
+    With `serve_degraded`, a failed probe reports the service as ready with
+    status 'degraded': emojis can still be served by the heuristic engine,
+    and taking every replica out of service would not bring the LLM back.
+    This only applies while moderation fails open. Otherwise every moderated
+    message would be rejected, so the service is not ready.
+    """
+
+    def __init__(self, llm_client, interval: float, timeout: float, max_staleness: float,
+                 serve_degraded: bool = False):
+        self.llm_client = llm_client
+        self.interval = interval
+        self.timeout = timeout
+        self.max_staleness = max_staleness
+        self.serve_degraded = serve_degraded
+        self._result = ReadinessResponse(status="starting", ready=False, detail="No probe has completed yet")
+        self._checked_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start probing in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop background probing."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def status(self) -> ReadinessResponse:
+        """The cached readiness result."""
+        if self._checked_at is not None and time.monotonic() - self._checked_at > self.max_staleness:
+            return self._result.model_copy(update={
+                "status": "stale",
+                "ready": False,
+                "detail": f"Last readiness probe is older than {self.max_staleness:g}s",
+            })
+        return self._result
+
+    async def _run(self):
+        with calls_for(Caller(endpoint="readiness_probe", client="-")):
+            while True:
+                await self.probe()
+                await asyncio.sleep(self.interval)
+
+    async def probe(self) -> ReadinessResponse:
+        """Probe the LLM server once and cache the result."""
+        start = time.monotonic()
+        status, ready, detail = "ready", True, None
+        model_available = None
+        generation_ok = None
+        try:
+            # Held in use, so a reload does not close the client halfway through the probe
+            with self.llm_client.current_instance().in_use() as llm_client:
+                client = llm_client.client
+                listing = await asyncio.wait_for(client.list(), timeout=self.timeout)
+                available = [model.model for model in listing.models]
+                required = {llm_client.model, llm_client.moderation_model}
+                missing = [model for model in required if not _model_available(model, available)]
+                model_available = not missing
+                if missing:
+                    raise RuntimeError(f"Model(s) not available on LLM server: {', '.join(sorted(missing))}")
+
+                response = await asyncio.wait_for(
+                    client.generate(model=llm_client.model, prompt="Hi", options={'num_predict': 1}),
+                    timeout=self.timeout
+                )
+                generation_ok = bool(response) and 'response' in response
+                if generation_ok:
+                    usage_tracker.record(llm_client.model, response)
+                if not generation_ok:
+                    raise RuntimeError("LLM server returned an invalid generation response")
+        except Exception as e:
+            status, ready = "not_ready", False
+            detail = "LLM server probe timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+            if self.serve_degraded and self.llm_client.current_instance().moderation_fail_open:
+                status, ready = "degraded", True
+        elapsed = time.monotonic() - start
+
+        if status == "ready" and self._result.status != "ready":
+            logger.info("LLM server is ready")
+        elif status != "ready" and self._result.status == "ready":
+            logger.warning(f"LLM server is no longer ready: {detail}")
+
+        self._result = ReadinessResponse(
+            status=status,
+            ready=ready,
+            model_available=model_available,
+            generation_ok=generation_ok,
+            probe_latency_ms=round(elapsed * 1000, 1),
+            checked_at=datetime.now(timezone.utc),
+            detail=detail
+        )
+        self._checked_at = time.monotonic()
+
+        llm_ready.set(1 if status == "ready" else 0)
+        llm_readiness_probe_duration_seconds.observe(elapsed)
+        return self._result
@@ -0,0 +1,152 @@
+"""Hedged LLM requests to cut tail latency."""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+llm_hedgeable_requests_total = metrics.counter(
+    "llm_hedgeable_requests_total",
+    "LLM requests that went through the hedging policy",
+    ["template"]
+)
+llm_hedged_requests_total = metrics.counter(
+    "llm_hedged_requests_total",
+    "LLM requests for which a hedge (duplicate) request was sent",
+    ["template"]
+)
+llm_hedge_wins_total = metrics.counter(
+    "llm_hedge_wins_total",
+    "Hedged LLM requests where the hedge returned a valid result first",
+    ["template"]
+)
+llm_hedges_skipped_total = metrics.counter(
+    "llm_hedges_skipped_total",
+    "LLM requests that were slow enough to hedge but were not hedged",
+    ["template", "reason"]
+)
+
+
+class LatencyWindow:
+    """
+    The most recent latencies of successful requests: at most `size` of
+    them, and with `max_age` only those from the last `max_age` seconds.
+    """
+
+    def __init__(self, size: int, max_age: Optional[float] = None):
+        self.max_age = max_age
+        # (time added, latency)
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=size)
+
+    def add(self, latency: float):
+        self._samples.append((time.monotonic(), latency))
+
+    def __len__(self) -> int:
+        self._expire()
+        return len(self._samples)
+
+    def percentile(self, percentile: float) -> float:
+        """Nearest-rank percentile of the window. The window must not be empty."""
+        self._expire()
+        ordered = sorted(latency for _, latency in self._samples)
+        rank = math.ceil(percentile / 100 * len(ordered))
+        return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+    def _expire(self):
+        if self.max_age is None:
+            return
+        oldest = time.monotonic() - self.max_age
+        while self._samples and self._samples[0][0] < oldest:
+            self._samples.popleft()
+
+
+class HedgePolicy:
+    """
+    Sends a duplicate of a slow request and takes whichever answers first.
+
+    If the primary attempt has not returned a valid result after the configured
+    percentile of recent latencies (per request kind), a hedge attempt is
+    started. The first valid result wins and the other attempt is cancelled.
+    Each request earns `budget` hedge tokens and each hedge spends one, so
+    hedges add at most that fraction of extra load over time.
+    """
+
+    def __init__(self, percentile: float, budget: float, min_delay: float,
+                 window_size: int = 200, min_samples: int = 20):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.window_size = window_size
+        self.min_samples = min_samples
+        # Allow short bursts of hedges, but never more than this many in a row
+        self._max_tokens = max(1.0, budget * 10)
+        self._tokens = 0.0
+        self._windows: Dict[str, LatencyWindow] = {}
+
+    def hedge_delay(self, kind: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there is too little latency data."""
+        window = self._windows.get(kind)
+        if window is None or len(window) < self.min_samples:
+            return None
+        return max(window.percentile(self.percentile), self.min_delay)
+
+    async def run(self, kind: str, attempt: Callable[[int], Awaitable[Any]],
+                  is_valid: Callable[[Any], bool]) -> Any:
+        """
+        Run `attempt(0)`, and `attempt(1)` as a hedge if the first is slow.
+
+        Returns:
+            The first valid result, or the last result if none was valid.
+            If every attempt raised, the last exception is re-raised.
+        """
+        llm_hedgeable_requests_total.inc(template=kind)
+        self._tokens = min(self._tokens + self.budget, self._max_tokens)
+
+        start = time.monotonic()
+        tasks = [asyncio.create_task(attempt(0))]
+        try:
+            delay = self.hedge_delay(kind)
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        llm_hedged_requests_total.inc(template=kind)
+                        logger.info(f"LLM request ({kind}) slower than {delay:.2f}s, sending hedge request")
+                        tasks.append(asyncio.create_task(attempt(1)))
+                    else:
+                        llm_hedges_skipped_total.inc(template=kind, reason="budget")
+
+            pending = set(tasks)
+            last = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    last = task
+                    if task.exception() is None and is_valid(task.result()):
+                        # The request's latency, from the start of the primary whichever attempt won.
+                        # Measuring a winning hedge from its own start would drop the slow primary's
+                        # sample and add a short one, dragging the percentile and the hedge delay down.
+                        self._record(kind, time.monotonic() - start)
+                        if tasks.index(task) == 1:
+                            llm_hedge_wins_total.inc(template=kind)
+                            logger.info(f"Hedge request ({kind}) won")
+                        return task.result()
+
+            return last.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _record(self, kind: str, latency: float):
+        window = self._windows.get(kind)
+        if window is None:
+            window = self._windows[kind] = LatencyWindow(self.window_size)
+        window.add(latency)
@@ -0,0 +1,371 @@
+"""Local heuristic emoji suggestions, used when the LLM path is unavailable or too slow."""
+
+from collections import deque
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+# Keyword or phrase -> (emojis, sentiment). Sentiment is between -1 and 1.
+LEXICON: Dict[str, Tuple[Tuple[str, ...], float]] = {
+    # Feelings
+    "happy": (("😊", "😄"), 0.8),
+    "glad": (("😊",), 0.6),
+    "joy": (("😄",), 0.8),
+    "excited": (("🤩", "🎉"), 0.8),
+    "can't wait": (("🤩",), 0.6),
+    "love": (("❤️", "😍"), 0.9),
+    "adore": (("😍",), 0.9),
+    "laugh": (("😂",), 0.6),
+    "funny": (("😂",), 0.6),
+    "lol": (("😂",), 0.5),
+    "proud": (("🥹", "💪"), 0.7),
+    "grateful": (("🙏",), 0.8),
+    "thank": (("🙏",), 0.7),
+    "thanks": (("🙏",), 0.7),
+    "relaxed": (("😌",), 0.5),
+    "calm": (("😌",), 0.4),
+    "sad": (("😢",), -0.7),
+    "cry": (("😭",), -0.7),
+    "crying": (("😭",), -0.7),
+    "miss": (("🥺",), -0.4),
+    "missing": (("🥺",), -0.4),
+    "lonely": (("😔",), -0.6),
+    "heartbroken": (("💔",), -0.9),
+    "angry": (("😠",), -0.8),
+    "mad": (("😠",), -0.7),
+    "furious": (("😡",), -0.9),
+    "annoyed": (("😤",), -0.6),
+    "ugh": (("😩",), -0.5),
+    "hate": (("😡",), -0.8),
+    "scared": (("😨",), -0.6),
+    "afraid": (("😨",), -0.6),
+    "terrified": (("😱",), -0.8),
+    "worried": (("😟",), -0.5),
+    "nervous": (("😬",), -0.4),
+    "stressed": (("😫",), -0.6),
+    "tired": (("😴",), -0.4),
+    "exhausted": (("😩", "😴"), -0.5),
+    "sleepy": (("😴",), -0.2),
+    "bored": (("🥱",), -0.3),
+    "sick": (("🤒",), -0.6),
+    "ill": (("🤒",), -0.6),
+    "hurt": (("🤕",), -0.6),
+    "surprised": (("😮",), 0.1),
+    "wow": (("😮",), 0.3),
+    "confused": (("😕",), -0.2),
+    "sorry": (("😔",), -0.3),
+    # Evaluations
+    "good": (("👍",), 0.5),
+    "great": (("👍",), 0.7),
+    "awesome": (("🤩",), 0.8),
+    "amazing": (("🤩",), 0.8),
+    "wonderful": (("✨",), 0.8),
+    "beautiful": (("😍",), 0.7),
+    "breathtaking": (("😍",), 0.8),
+    "perfect": (("👌",), 0.8),
+    "best": (("🏆",), 0.7),
+    "cool": (("😎",), 0.5),
+    "nice": (("🙂",), 0.5),
+    "fun": (("😄",), 0.6),
+    "bad": (("👎",), -0.5),
+    "terrible": (("😖",), -0.8),
+    "awful": (("😖",), -0.8),
+    "horrible": (("😖",), -0.8),
+    "worst": (("😩",), -0.8),
+    "hard": (("😓",), -0.3),
+    "failed": (("❌",), -0.6),
+    "fail": (("❌",), -0.6),
+    "broke": (("💔",), -0.4),
+    "broken": (("💔",), -0.4),
+    "cancelled": (("❌",), -0.5),
+    "lost": (("😞",), -0.5),
+    "win": (("🏆",), 0.7),
+    "won": (("🏆",), 0.7),
+    "finally": (("🙌",), 0.4),
+    # Occasions
+    "birthday": (("🎂", "🎁"), 0.6),
+    "happy birthday": (("🎂", "🎉"), 0.9),
+    "party": (("🥳", "🎉"), 0.7),
+    "celebrate": (("🎉", "🥂"), 0.8),
+    "celebrating": (("🎉", "🥂"), 0.8),
+    "anniversary": (("💍", "🥂"), 0.7),
+    "wedding": (("💍", "💒"), 0.8),
+    "christmas": (("🎄", "🎅"), 0.7),
+    "new year": (("🎆", "🥂"), 0.7),
+    "halloween": (("🎃", "👻"), 0.4),
+    "vacation": (("🏖️", "✈️"), 0.7),
+    "holiday": (("🏖️",), 0.6),
+    "weekend": (("🎉",), 0.4),
+    "monday": (("📅",), -0.2),
+    "promoted": (("🎉", "💼"), 0.9),
+    "promotion": (("🎉", "💼"), 0.9),
+    "graduated": (("🎓",), 0.8),
+    "graduation": (("🎓",), 0.8),
+    "thesis": (("🎓", "📚"), 0.0),
+    "exam": (("📝",), -0.1),
+    "test": (("📝",), 0.0),
+    "work": (("💼",), 0.0),
+    "job": (("💼",), 0.0),
+    "meeting": (("📅",), -0.1),
+    "school": (("🏫",), 0.0),
+    "study": (("📚",), 0.0),
+    "homework": (("📚",), -0.1),
+    "good morning": (("☀️", "☕"), 0.5),
+    "good night": (("🌙", "😴"), 0.4),
+    "hello": (("👋",), 0.3),
+    "hi": (("👋",), 0.2),
+    "bye": (("👋",), 0.0),
+    # Food and drink
+    "pizza": (("🍕",), 0.3),
+    "pasta": (("🍝",), 0.3),
+    "burger": (("🍔",), 0.3),
+    "sushi": (("🍣",), 0.3),
+    "taco": (("🌮",), 0.3),
+    "cake": (("🍰",), 0.4),
+    "cookie": (("🍪",), 0.3),
+    "cookies": (("🍪",), 0.3),
+    "ice cream": (("🍦",), 0.5),
+    "chocolate": (("🍫",), 0.4),
+    "coffee": (("☕",), 0.2),
+    "tea": (("🍵",), 0.2),
+    "beer": (("🍺",), 0.3),
+    "wine": (("🍷",), 0.3),
+    "dinner": (("🍽️",), 0.2),
+    "lunch": (("🥪",), 0.1),
+    "breakfast": (("🥞",), 0.2),
+    "cooking": (("🍳",), 0.2),
+    "hungry": (("😋",), 0.0),
+    "delicious": (("😋",), 0.8),
+    "yummy": (("😋",), 0.8),
+    "tasty": (("😋",), 0.7),
+    "burned": (("🔥",), -0.4),
+    # Weather and nature
+    "sun": (("☀️",), 0.4),
+    "sunny": (("☀️",), 0.5),
+    "sunset": (("🌅",), 0.5),
+    "sunrise": (("🌄",), 0.5),
+    "rain": (("🌧️", "☔"), -0.2),
+    "raining": (("🌧️", "☔"), -0.2),
+    "umbrella": (("☂️",), 0.0),
+    "snow": (("❄️", "⛄"), 0.2),
+    "snowman": (("⛄",), 0.5),
+    "storm": (("⛈️",), -0.4),
+    "cold": (("🥶",), -0.3),
+    "hot": (("🥵",), -0.1),
+    "beach": (("🏖️", "🌊"), 0.6),
+    "sea": (("🌊",), 0.3),
+    "ocean": (("🌊",), 0.3),
+    "mountain": (("⛰️",), 0.3),
+    "mountains": (("⛰️",), 0.3),
+    "park": (("🌳",), 0.3),
+    "flower": (("🌸",), 0.5),
+    "flowers": (("💐",), 0.5),
+    "dark": (("🌑",), -0.2),
+    "night": (("🌙",), 0.0),
+    # Animals
+    "cat": (("🐱",), 0.3),
+    "kitten": (("🐱",), 0.5),
+    "dog": (("🐶",), 0.3),
+    "puppy": (("🐶",), 0.6),
+    "bird": (("🐦",), 0.2),
+    "horse": (("🐴",), 0.2),
+    "fish": (("🐟",), 0.1),
+    # Activities
+    "run": (("🏃",), 0.2),
+    "running": (("🏃",), 0.2),
+    "marathon": (("🏃", "🏅"), 0.3),
+    "gym": (("💪",), 0.3),
+    "workout": (("💪",), 0.3),
+    "football": (("⚽",), 0.3),
+    "soccer": (("⚽",), 0.3),
+    "basketball": (("🏀",), 0.3),
+    "tennis": (("🎾",), 0.3),
+    "swim": (("🏊",), 0.3),
+    "bike": (("🚴",), 0.3),
+    "game": (("🎮",), 0.3),
+    "gaming": (("🎮",), 0.3),
+    "music": (("🎵",), 0.5),
+    "song": (("🎶",), 0.4),
+    "concert": (("🎤", "🎶"), 0.6),
+    "dance": (("💃",), 0.6),
+    "dancing": (("💃",), 0.6),
+    "movie": (("🎬", "🍿"), 0.3),
+    "horror": (("👻",), -0.2),
+    "book": (("📖",), 0.3),
+    "reading": (("📖",), 0.3),
+    "travel": (("✈️", "🌍"), 0.5),
+    "flight": (("✈️",), 0.0),
+    "trip": (("🧳",), 0.4),
+    "shopping": (("🛍️",), 0.4),
+    "sleep": (("😴",), 0.0),
+    "bed": (("🛏️",), 0.0),
+    # People and things
+    "friend": (("👫",), 0.5),
+    "friends": (("👫",), 0.5),
+    "family": (("👨‍👩‍👧",), 0.5),
+    "kids": (("🧒",), 0.3),
+    "baby": (("👶",), 0.6),
+    "mom": (("👩",), 0.4),
+    "dad": (("👨",), 0.4),
+    "home": (("🏠",), 0.3),
+    "money": (("💰",), 0.2),
+    "phone": (("📱",), 0.0),
+    "battery": (("🔋",), 0.0),
+    "car": (("🚗",), 0.0),
+    "computer": (("💻",), 0.0),
+    "fire": (("🔥",), -0.2),
+    "gift": (("🎁",), 0.6),
+}
+
+NEGATIONS = frozenset({"not", "no", "never", "don't", "dont", "isn't", "isnt", "wasn't", "wasnt",
+                       "aren't", "arent", "didn't", "didnt", "can't", "cant", "won't", "wont", "hardly"})
+INTENSIFIERS = frozenset({"so", "very", "really", "super", "extremely", "totally", "absolutely"})
+
+# Word endings that may follow a keyword, so "laughing" matches "laugh". Only keywords of at least
+# MIN_STEM_LENGTH letters take them: shorter ones would match unrelated words, like "his" for "hi".
+SUFFIXES = ("", "s", "es", "ed", "d", "ing", "y")
+MIN_STEM_LENGTH = 4
+
+# Inflected forms of the short keywords, which do not take the common endings: form -> keyword
+INFLECTIONS = {
+    "cats": "cat", "dogs": "dog", "cars": "car", "moms": "mom", "dads": "dad", "jobs": "job",
+    "wins": "win", "winning": "win", "runs": "run", "ran": "run", "cries": "cry", "cried": "cry",
+    "beds": "bed", "hotter": "hot", "joys": "joy", "lols": "lol",
+}
+LEXICON.update({form: LEXICON[keyword] for form, keyword in INFLECTIONS.items()})
+
+# Emojis for the overall sentiment, strongest first: (minimum score, emojis)
+SENTIMENT_EMOJIS = (
+    (1.2, ("😄", "🎉")),
+    (0.3, ("😊",)),
+    (-0.3, ()),
+    (-1.2, ("😔",)),
+    (float("-inf"), ("😢", "💔")),
+)
+DEFAULT_EMOJIS = ["😊", "👍"]
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char in "'-"
+
+
+class Match(NamedTuple):
+    start: int
+    end: int
+    term: str
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton that finds all occurrences of a set of terms in one pass."""
+
+    def __init__(self, terms: Sequence[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+
+        for term in terms:
+            state = 0
+            for char in term:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].append(term)
+
+        # Breadth-first, so the failure state of each node is final before its children need it
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text: str) -> List[Match]:
+        matches = []
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for term in self._output[state]:
+                matches.append(Match(index + 1 - len(term), index + 1, term))
+        return matches
+
+
+class HeuristicEmojiEngine:
+    """
+    Suggests emojis from keywords in a message and its overall sentiment.
+
+    Keywords are matched as whole words, optionally followed by a common
+    ending. A keyword preceded by a negation ("not happy") contributes no
+    emojis and flips its sentiment. Emojis of the matched keywords come
+    first, in order of appearance, followed by emojis for the sentiment.
+    """
+
+    def __init__(self, lexicon: Dict[str, Tuple[Tuple[str, ...], float]]):
+        self.lexicon = lexicon
+        self._matcher = AhoCorasick(list(lexicon))
+
+    def suggest(self, message: str, limit: int = 5) -> List[str]:
+        text = message.lower().replace("’", "'")
+        emojis: List[str] = []
+        score = 0.0
+
+        for match in self._whole_words(text):
+            term_emojis, sentiment = self.lexicon[match.term]
+            preceding = text[:match.start].split()[-3:]
+            if any(word.strip(".,!?") in NEGATIONS for word in preceding):
+                score -= sentiment
+                continue
+            if preceding and preceding[-1] in INTENSIFIERS:
+                sentiment *= 1.5
+            score += sentiment
+            for emoji in term_emojis:
+                if emoji not in emojis:
+                    emojis.append(emoji)
+
+        if "!" in text:
+            score *= 1.2
+        for threshold, sentiment_emojis in SENTIMENT_EMOJIS:
+            if score >= threshold:
+                for emoji in sentiment_emojis:
+                    if emoji not in emojis:
+                        emojis.append(emoji)
+                break
+
+        return emojis[:limit] if emojis else list(DEFAULT_EMOJIS)
+
+    def _whole_words(self, text: str) -> List[Match]:
+        """Matches that form whole words, keeping only the longest of overlapping ones."""
+        candidates = []
+        for match in self._matcher.find(text):
+            if match.start > 0 and _is_word_char(text[match.start - 1]):
+                continue
+            end = self._word_end(text, match.end, match.term)
+            if end is not None:
+                candidates.append(Match(match.start, end, match.term))
+
+        # Longest first, so "happy birthday" wins over "happy" and "birthday"
+        candidates.sort(key=lambda match: (match.start - match.end, match.start))
+        chosen: List[Match] = []
+        for match in candidates:
+            if all(match.end <= other.start or match.start >= other.end for other in chosen):
+                chosen.append(match)
+        return sorted(chosen)
+
+    @staticmethod
+    def _word_end(text: str, end: int, term: str):
+        """End of the word if the match is followed by one of the allowed endings, else None."""
+        for suffix in SUFFIXES if len(term) >= MIN_STEM_LENGTH else ("",):
+            after = end + len(suffix)
+            if text.startswith(suffix, end) and (after == len(text) or not _is_word_char(text[after])):
+                return after
+        return None
+
+
+# Global engine, with the matcher built once at import
+heuristic_emojis = HeuristicEmojiEngine(LEXICON)
@@ -0,0 +1,201 @@
+"""In-process priority job queue for asynchronous emoji generation."""
+
+import asyncio
+import itertools
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from metrics import metrics
+from models import JobRequest, JobResponse, JobStatsResponse
+from tracing import current_span, tracer
+from usage import calls_for, current_caller
+
+logger = logging.getLogger(__name__)
+
+jobs_total = metrics.counter(
+    "jobs_total",
+    "Finished asynchronous jobs by final status",
+    ["status"]
+)
+job_queue_wait_seconds = metrics.histogram(
+    "job_queue_wait_seconds",
+    "Time jobs spent queued before a worker picked them up"
+)
+job_queue_depth = metrics.gauge("job_queue_depth", "Jobs waiting in the queue")
+job_queue_oldest_age_seconds = metrics.gauge(
+    "job_queue_oldest_age_seconds",
+    "Age of the oldest job waiting in the queue"
+)
+job_workers_busy = metrics.gauge("job_workers_busy", "Job workers currently processing a job")
+job_worker_utilization = metrics.gauge(
+    "job_worker_utilization",
+    "Fraction of job workers currently processing a job"
+)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class Job:
+    """A single asynchronous emoji generation job."""
+
+    def __init__(self, request: JobRequest):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.status = "queued"
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.status_code: Optional[int] = None
+        self.created_at = datetime.now(timezone.utc)
+        self.enqueued = time.monotonic()
+        self.finished: Optional[float] = None
+        self.done = asyncio.Event()
+        # Links the job's processing to the trace of the request that submitted it
+        span = current_span()
+        self.traceparent = span.traceparent if span else None
+        self.caller = current_caller()
+
+    def to_response(self) -> JobResponse:
+        return JobResponse(
+            job_id=self.id,
+            status=self.status,
+            created_at=self.created_at,
+            result=self.result,
+            error=self.error,
+            status_code=self.status_code
+        )
+
+
+class JobQueue:
+    """
+    Priority queue of emoji jobs served by a fixed pool of worker coroutines.
+
+    Jobs with a lower priority value are processed first, and jobs of equal
+    priority in submission order. Finished jobs are kept for `result_ttl`
+    seconds so clients can fetch their result. The API only uses `submit`,
+    `get`, `wait` and `stats`, so an implementation backed by an external
+    broker can replace this one without touching the endpoints.
+    """
+
+    def __init__(self, processor: Callable[[JobRequest], Awaitable[Dict[str, Any]]],
+                 workers: int, max_size: int, result_ttl: float):
+        self.processor = processor
+        self.workers = max(1, workers)
+        self.max_size = max_size
+        self.result_ttl = result_ttl
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._jobs: Dict[str, Job] = {}
+        # Insertion ordered, so the first entry is always the oldest
+        self._queued: "OrderedDict[str, Job]" = OrderedDict()
+        self._finished: "OrderedDict[str, Job]" = OrderedDict()
+        self._busy = 0
+        self._tasks: List[asyncio.Task] = []
+
+        job_queue_depth.set_function(lambda: len(self._queued))
+        job_queue_oldest_age_seconds.set_function(self.oldest_age)
+        job_workers_busy.set_function(lambda: self._busy)
+        job_worker_utilization.set_function(lambda: self._busy / self.workers)
+
+    def start(self):
+        """Start the worker coroutines."""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker(index)) for index in range(self.workers)]
+            logger.info(f"Job queue started with {self.workers} workers")
+
+    async def stop(self):
+        """Stop the workers. Jobs still queued are dropped."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, request: JobRequest) -> Job:
+        """Queue a job and return it immediately."""
+        self._expire()
+        if len(self._queued) >= self.max_size:
+            raise QueueFullError(f"Job queue is full ({self.max_size} jobs waiting)")
+
+        job = Job(request)
+        self._jobs[job.id] = job
+        self._queued[job.id] = job
+        self._queue.put_nowait((request.priority, next(self._sequence), job))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job by ID, or None if it is unknown or its result has expired."""
+        self._expire()
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: Job, timeout: float) -> Job:
+        """Wait up to `timeout` seconds for a job to finish."""
+        if timeout > 0 and not job.done.is_set():
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    def oldest_age(self) -> float:
+        """Seconds the oldest queued job has been waiting, 0 if none."""
+        if not self._queued:
+            return 0.0
+        oldest = next(iter(self._queued.values()))
+        return time.monotonic() - oldest.enqueued
+
+    def stats(self) -> JobStatsResponse:
+        return JobStatsResponse(
+            queue_depth=len(self._queued),
+            oldest_job_age_seconds=round(self.oldest_age(), 3),
+            workers=self.workers,
+            workers_busy=self._busy,
+            worker_utilization=self._busy / self.workers,
+            max_queue_size=self.max_size
+        )
+
+    async def _worker(self, index: int):
+        while True:
+            _, _, job = await self._queue.get()
+            self._queued.pop(job.id, None)
+            job_queue_wait_seconds.observe(time.monotonic() - job.enqueued)
+
+            self._busy += 1
+            job.status = "running"
+            try:
+                with tracer.start_span("job", attributes={"job.id": job.id, "job.priority": job.request.priority},
+                                       traceparent=job.traceparent), calls_for(job.caller):
+                    job.result = await self.processor(job.request)
+                job.status = "succeeded"
+            except HTTPException as e:
+                job.status = "failed"
+                job.error = e.detail
+                job.status_code = e.status_code
+            except Exception as e:
+                logger.error(f"Job {job.id} failed in worker {index}: {str(e)}", exc_info=True)
+                job.status = "failed"
+                job.error = "Failed to generate emojis"
+                job.status_code = 500
+            finally:
+                self._busy -= 1
+
+            jobs_total.inc(status=job.status)
+            job.finished = time.monotonic()
+            self._finished[job.id] = job
+            job.done.set()
+
+    def _expire(self):
+        """Forget finished jobs whose results are older than the TTL."""
+        cutoff = time.monotonic() - self.result_ttl
+        while self._finished:
+            job_id, job = next(iter(self._finished.items()))
+            if job.finished > cutoff:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
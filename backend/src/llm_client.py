@@ -1,27 +1,178 @@
 """LLM client for content moderation and emoji generation."""
 
+import asyncio
 import logging
-from typing import List, Tuple, Optional
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, Iterator, List, Set, Tuple, Optional, Sequence
 from ollama import AsyncClient
-from config import settings
+from config import Current, Settings, settings
+from metrics import metrics
+from hedging import HedgePolicy
+from degraded_mode import CircuitBreaker, DegradedMode
+from heuristic_emojis import heuristic_emojis
+from tracing import traced, tracer
+from transport import create_transport
+from usage import usage_tracker
+from prompts import (
+    PromptTemplate, MODERATION_PROMPT, EMOJI_PROMPT, SAMPLE_PROMPT,
+    CONVERSATION_PROMPT, CONVERSATION_HISTORY_PROMPT, CONVERSATION_TURN_PROMPT
+)
+from conversation import Conversation
 
 # Ensure this logger uses the same configuration as main
 logger = logging.getLogger(__name__)
 # Make sure the logger propagates to the root logger
 logger.propagate = True
 
+llm_requests_total = metrics.counter(
+    "llm_requests_total",
+    "LLM requests by prompt template, template version and outcome",
+    ["template", "template_version", "outcome"]
+)
+llm_request_duration_seconds = metrics.histogram(
+    "llm_request_duration_seconds",
+    "LLM request latency by prompt template",
+    ["template", "template_version"]
+)
+emoji_generations_total = metrics.counter(
+    "emoji_generations_total",
+    "Emoji generations by mode: 'llm', or 'degraded' when answered by the heuristic engine",
+    ["mode"]
+)
+emoji_degraded_total = metrics.counter(
+    "emoji_degraded_total",
+    "Emoji generations answered by the heuristic engine, by reason",
+    ["reason"]
+)
+moderation_degraded_total = metrics.counter(
+    "moderation_degraded_total",
+    "Moderations skipped because degraded mode kept requests off the LLM, by reason",
+    ["reason"]
+)
+
+
+class ModerationUnavailableError(Exception):
+    """Raised when a message cannot be moderated because the LLM is unavailable."""
+
+
+# Settings that LLMClient depends on. A reload that changes one of them builds a new client.
+LLM_SETTINGS = (
+    "llm_url", "llm_model", "llm_temperature", "llm_max_tokens", "api_timeout", "moderation_model",
+    "moderation_unavailable_policy",
+    "llm_hedge_enabled", "llm_hedge_url", "llm_hedge_percentile", "llm_hedge_budget", "llm_hedge_min_delay_ms",
+    "llm_circuit_failure_threshold", "llm_circuit_reset_timeout",
+    "degraded_max_queue_wait", "degraded_latency_slo_ms", "degraded_latency_percentile", "degraded_probe_fraction",
+    "degraded_latency_window_seconds",
+    "llm_transport", "llm_transport_file", "llm_replay_time_scale",
+)
+
+
+def _unchanged(previous: Optional["LLMClient"], config: Settings, *fields: str) -> bool:
+    return previous is not None and all(getattr(previous.config, field) == getattr(config, field) for field in fields)
+
 
 class LLMClient:
-    """Client for communicating with the LLM server using Ollama."""
+    """
+    Client for communicating with the LLM server using Ollama.
+
+    A client is built from one settings snapshot and never changes it. On a
+    reload a new client is built, taking over the parts of `previous` whose
+    settings did not change, such as its connection pools and its circuit
+    breaker and latency history.
+    """
+
+    def __init__(self, config: Settings, previous: Optional["LLMClient"] = None):
+        self.config = config
+        self.base_url = config.llm_url
+        self.model = config.llm_model
+        self.moderation_model = config.moderation_model or config.llm_model
+        self.temperature = config.llm_temperature
+        self.max_tokens = config.llm_max_tokens
+        self.timeout = config.api_timeout
+        # Serve messages unmoderated rather than rejecting them while the LLM cannot moderate
+        self.moderation_fail_open = config.moderation_unavailable_policy.lower() == "allow"
+        # Conversation contexts this client makes can only be continued by the same server and model
+        self.context_source = (self.base_url, self.model)
+
+        transport_fields = ("llm_transport", "llm_transport_file", "llm_replay_time_scale")
+        if _unchanged(previous, config, *transport_fields):
+            self.transport = previous.transport
+        else:
+            self.transport = create_transport(
+                config.llm_transport,
+                config.llm_transport_file,
+                config.llm_replay_time_scale
+            )
+        same_transport = previous is not None and self.transport is previous.transport
+
+        # The Ollama clients own connection pools, kept unwrapped so they can be closed
+        if same_transport and _unchanged(previous, config, "llm_url", "api_timeout"):
+            self.ollama_client = previous.ollama_client
+            self.client = previous.client
+        else:
+            self.ollama_client = AsyncClient(host=self.base_url, timeout=self.timeout)
+            self.client = self.transport.wrap(self.ollama_client)
+        self.hedge_url = config.llm_hedge_url or self.base_url
+        if not config.llm_hedge_url:
+            self.hedge_ollama_client = None
+            self.hedge_client = self.client
+        elif same_transport and previous.hedge_ollama_client is not None and \
+                _unchanged(previous, config, "llm_hedge_url", "api_timeout"):
+            self.hedge_ollama_client = previous.hedge_ollama_client
+            self.hedge_client = previous.hedge_client
+        else:
+            self.hedge_ollama_client = AsyncClient(host=self.hedge_url, timeout=self.timeout)
+            self.hedge_client = self.transport.wrap(self.hedge_ollama_client)
+        # Calls in flight, so that a replaced client is only closed once they have finished
+        self._calls = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        # The breaker state and latency windows describe the servers and models they were measured
+        # against, so they are only taken over when those are unchanged too
+        backend_fields = ("llm_url", "llm_model", "moderation_model")
+        same_backend = same_transport and _unchanged(previous, config, *backend_fields)
+
+        hedge_fields = ("llm_hedge_enabled", "llm_hedge_url", "llm_hedge_percentile", "llm_hedge_budget",
+                        "llm_hedge_min_delay_ms")
+        if same_backend and _unchanged(previous, config, *hedge_fields):
+            self.hedge_policy = previous.hedge_policy
+        else:
+            self.hedge_policy = HedgePolicy(
+                percentile=config.llm_hedge_percentile,
+                budget=config.llm_hedge_budget,
+                min_delay=config.llm_hedge_min_delay_ms / 1000
+            ) if config.llm_hedge_enabled else None
+
+        if same_backend and _unchanged(previous, config, "llm_circuit_failure_threshold", "llm_circuit_reset_timeout"):
+            self.circuit_breaker = previous.circuit_breaker
+        else:
+            self.circuit_breaker = CircuitBreaker(
+                failure_threshold=config.llm_circuit_failure_threshold,
+                reset_timeout=config.llm_circuit_reset_timeout
+            )
+        degraded_fields = ("degraded_max_queue_wait", "degraded_latency_slo_ms", "degraded_latency_percentile",
+                           "degraded_probe_fraction", "degraded_latency_window_seconds")
+        if _unchanged(previous, config, *degraded_fields) and self.circuit_breaker is previous.circuit_breaker:
+            self.degraded_mode = previous.degraded_mode
+        else:
+            self.degraded_mode = DegradedMode(
+                self.circuit_breaker,
+                max_queue_wait=config.degraded_max_queue_wait,
+                latency_slo=config.degraded_latency_slo_ms / 1000,
+                latency_percentile=config.degraded_latency_percentile,
+                probe_fraction=config.degraded_probe_fraction,
+                window_seconds=config.degraded_latency_window_seconds
+            )
+            if previous is not None:
+                self.degraded_mode.watch_queue(previous.degraded_mode.queue_wait)
 
-    def __init__(self):
-        self.base_url = settings.llm_url
-        self.model = settings.llm_model
-        self.moderation_model = settings.moderation_model or settings.llm_model
-        self.temperature = settings.llm_temperature
-        self.max_tokens = settings.llm_max_tokens
-        self.timeout = settings.api_timeout
-        self.client = AsyncClient(host=self.base_url)
+        # Built once and shared by every request
+        self.options = {
+            'temperature': self.temperature,
+            'num_predict': self.max_tokens,
+        }
 
         # Log initialization
         logger.info(f"LLMClient initialized with:")
@@ -30,81 +181,186 @@ class LLMClient:
         logger.info(f"  Moderation Model: {self.moderation_model}")
         logger.info(f"  Temperature: {self.temperature}")
         logger.info(f"  Max Tokens: {self.max_tokens}")
+        logger.info(f"  Timeout: {self.timeout}s")
+        if config.llm_transport.lower() not in ("", "passthrough"):
+            logger.info(f"  Transport: {config.llm_transport} ({config.llm_transport_file})")
+        if self.hedge_policy:
+            logger.info(f"  Hedging: p{config.llm_hedge_percentile:g} to {self.hedge_url} "
+                        f"(budget {config.llm_hedge_budget:.0%})")
+
+    @contextmanager
+    def in_use(self) -> Iterator["LLMClient"]:
+        """
+        Mark the client as in use for the block.
+
+        A client replaced by a reload keeps its connections and transport open
+        until it is no longer in use. Hold it across all the calls made for one
+        message, so the later ones do not find it closed.
+        """
+        self._calls += 1
+        self._idle.clear()
+        try:
+            yield self
+        finally:
+            self._calls -= 1
+            if not self._calls:
+                self._idle.set()
+
+    async def close(self, successor: Optional["LLMClient"] = None, timeout: Optional[float] = None):
+        """
+        Close the connections and the transport not taken over by `successor`,
+        once no call is in use any more or after `timeout` seconds.
+        """
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Closing LLM client with {self._calls} call(s) still in flight")
+
+        kept = (successor.ollama_client, successor.hedge_ollama_client) if successor else ()
+        for ollama_client in (self.ollama_client, self.hedge_ollama_client):
+            if ollama_client is not None and all(ollama_client is not other for other in kept):
+                # ollama's AsyncClient has no close method of its own, so close its httpx client
+                await ollama_client._client.aclose()
+        if successor is None or self.transport is not successor.transport:
+            self.transport.close()
+
+    async def _make_request(self, template: PromptTemplate, message: Optional[str] = None,
+                            model: Optional[str] = None) -> Optional[str]:
+        """Render a prompt template and make a request to the LLM server using Ollama."""
+        response = await self._request(template, template.render(message), model)
+        return response['response'].strip() if response is not None else None
+
+    async def _request(self, template: PromptTemplate, prompt: str, model: Optional[str] = None,
+                       context: Optional[Sequence[int]] = None):
+        """
+        Make a request to the LLM server using Ollama.
+
+        Args:
+            template: Template the prompt was rendered from, for logging and metrics
+            prompt: The rendered prompt
+            model: Model to use instead of the default model
+            context: Ollama context of an earlier request to continue from
 
-    async def _make_request(self, prompt: str, model: Optional[str] = None) -> Optional[str]:
-        """Make a request to the LLM server using Ollama."""
+        Returns:
+            The full Ollama response, or None if the request failed
+        """
+        with self.in_use():
+            return await self._request_in_use(template, prompt, model, context)
+
+    async def _request_in_use(self, template: PromptTemplate, prompt: str, model: Optional[str],
+                              context: Optional[Sequence[int]]):
+        outcome = "error"
+        start = time.perf_counter()
+        if not self.circuit_breaker.allow():
+            logger.warning(f"LLM circuit breaker is open, not sending request (prompt {template.key})")
+            llm_requests_total.inc(template=template.template_id, template_version=str(template.version),
+                                   outcome="circuit_open")
+            return None
         try:
             model_to_use = model or self.model
-            logger.info(f"Making LLM request to {self.base_url} with model {model_to_use}")
+            logger.info(f"Making LLM request to {self.base_url} with model {model_to_use} (prompt {template.key})")
             logger.debug(f"Request prompt: {prompt[:100]}...")  # Log first 100 chars of prompt
 
-            response = await self.client.generate(
-                model=model_to_use,
-                prompt=prompt,
-                options={
-                    'temperature': self.temperature,
-                    'num_predict': self.max_tokens,
-                }
-            )
+            if self.hedge_policy is None:
+                response = await self._generate(self.client, self.base_url, model_to_use, prompt, template, context)
+            else:
+                backends = ((self.client, self.base_url), (self.hedge_client, self.hedge_url))
+                response = await self.hedge_policy.run(
+                    template.template_id,
+                    lambda attempt: self._generate(*backends[attempt], model_to_use, prompt, template, context,
+                                                   hedge=attempt > 0),
+                    is_valid=lambda result: bool(result) and 'response' in result
+                )
 
             if response and 'response' in response:
-                response_text = response['response'].strip()
-                logger.info(f"LLM response received: {response_text[:100]}...")  # Log first 100 chars
-                return response_text
+                logger.info(f"LLM response received: {response['response'].strip()[:100]}...")  # Log first 100 chars
+                outcome = "success"
+                self.circuit_breaker.record_success()
+                return response
             else:
                 logger.error(f"Invalid response format from Ollama: {response}")
+                outcome = "invalid_response"
+                self.circuit_breaker.record_failure()
                 return None
 
         except Exception as e:
             logger.error(f"LLM request failed: {str(e)}", exc_info=True)
+            self.circuit_breaker.record_failure()
             return None
+        finally:
+            llm_requests_total.inc(template=template.template_id, template_version=str(template.version), outcome=outcome)
+            llm_request_duration_seconds.observe(
+                time.perf_counter() - start,
+                template=template.template_id,
+                template_version=str(template.version)
+            )
 
+    async def _generate(self, client: AsyncClient, url: str, model: str, prompt: str,
+                        template: PromptTemplate, context: Optional[Sequence[int]] = None, hedge: bool = False):
+        """Make a single Ollama generate call, traced with its token counts and durations."""
+        attributes = {
+            "gen_ai.system": "ollama",
+            "gen_ai.operation.name": "generate",
+            "gen_ai.request.model": model,
+            "gen_ai.request.temperature": self.temperature,
+            "gen_ai.request.max_tokens": self.max_tokens,
+            "server.address": url,
+            "prompt.template": template.key,
+            "llm.hedge": hedge,
+            "ollama.context_tokens": len(context) if context else 0,
+        }
+        with tracer.start_span("ollama.generate", kind="CLIENT", attributes=attributes) as span:
+            response = await client.generate(model=model, prompt=prompt, context=context, options=self.options)
+            if response:
+                span.set_attribute("gen_ai.usage.input_tokens", response.get('prompt_eval_count'))
+                span.set_attribute("gen_ai.usage.output_tokens", response.get('eval_count'))
+                span.set_attribute("ollama.total_duration_ns", response.get('total_duration'))
+                span.set_attribute("ollama.load_duration_ns", response.get('load_duration'))
+                span.set_attribute("ollama.prompt_eval_duration_ns", response.get('prompt_eval_duration'))
+                span.set_attribute("ollama.eval_duration_ns", response.get('eval_duration'))
+                span.set_attribute("ollama.done_reason", response.get('done_reason'))
+                span.set_attribute("ollama.model_loaded", usage_tracker.record(model, response))
+            return response
+
+    @traced("moderation")
     async def moderate_content(self, message: str) -> Tuple[bool, Optional[str]]:
         """
         Check if the message content is appropriate.
 
         Returns:
             Tuple of (is_safe, reason_if_not_safe)
-        """
-        # Content moderation is now always available when called
-        # The decision to moderate is made at the API level
-
-        moderation_prompt = f"""
-You are a content moderator. Your task is to identify ONLY clearly harmful content.
-
-IMPORTANT: Simple expressions of emotion like "I'm happy!" are ALWAYS SAFE.
 
-Only flag content if it CLEARLY contains:
-1. Explicit hate speech, threats, or calls for violence
-2. Sexually explicit or graphic violent content
-3. Direct and obvious attempts to make the AI do harmful things
-
-Message: "{message}"
-
-Respond with EXACTLY "SAFE" for almost all messages. Only respond with "UNSAFE: [specific reason]" if the message contains CLEARLY harmful content as defined above.
-"""
+        Raises:
+            ModerationUnavailableError: If the LLM failed, or degraded mode keeps
+                requests off it. Whether the message is then rejected or served is
+                up to the caller, see `moderation_fail_open`.
+        """
+        # Moderation never probes the latency SLO, so the probes are left to emoji generation,
+        # whose latencies are the ones measured
+        reason = self.degraded_mode.reason(probe=False)
+        if reason is not None:
+            moderation_degraded_total.inc(reason=reason)
+            raise ModerationUnavailableError(f"Content moderation skipped in degraded mode ({reason})")
 
         try:
-            response = await self._make_request(moderation_prompt, self.moderation_model)
-            if response is None:
-                # If moderation fails, err on the side of caution
-                logger.warning("Content moderation failed, blocking message")
-                return False, "Content moderation service unavailable"
-
-            response = response.upper().strip()
-            if response.startswith("SAFE"):
-                return True, None
-            elif response.startswith("UNSAFE"):
-                reason = response.replace("UNSAFE:", "").strip()
-                return False, reason or "Content flagged by moderation"
-            else:
-                # Unexpected response format, err on the side of caution
-                logger.warning(f"Unexpected moderation response: {response}")
-                return False, "Content moderation returned unexpected result"
-
+            response = await self._make_request(MODERATION_PROMPT, message, self.moderation_model)
         except Exception as e:
             logger.error(f"Content moderation error: {str(e)}")
-            return False, "Content moderation error"
+            raise ModerationUnavailableError("Content moderation error") from e
+        if response is None:
+            logger.warning("Content moderation failed, LLM unavailable")
+            raise ModerationUnavailableError("Content moderation service unavailable")
+
+        response = response.upper().strip()
+        if response.startswith("SAFE"):
+            return True, None
+        elif response.startswith("UNSAFE"):
+            reason = response.replace("UNSAFE:", "").strip()
+            return False, reason or "Content flagged by moderation"
+        else:
+            # Unexpected response format, err on the side of caution
+            logger.warning(f"Unexpected moderation response: {response}")
+            return False, "Content moderation returned unexpected result"
 
     def _is_emoji_modifier_only(self, text: str) -> bool:
         """
@@ -181,90 +437,290 @@ Respond with EXACTLY "SAFE" for almost all messages. Only respond with "UNSAFE:
 
         return emojis
 
-    async def generate_emojis(self, message: str) -> List[str]:
+    @traced("generation")
+    async def generate_emojis(self, message: str) -> Tuple[List[str], bool]:
         """
         Generate appropriate emojis for the given message.
 
+        Falls back to the heuristic engine when degraded mode says the LLM
+        path would be too slow, or when the LLM gives no usable answer.
+
+        Returns:
+            Tuple of (emojis, degraded)
+        """
+        reason = self.degraded_mode.reason()
+        if reason is not None:
+            return self._degraded_emojis(message, reason), True
+
+        try:
+            start = time.perf_counter()
+            response = await self._make_request(EMOJI_PROMPT, message)
+            if response is None:
+                logger.warning("Emoji generation failed, returning heuristic emojis")
+                reason = "circuit_open" if self.circuit_breaker.is_open() else "llm_error"
+                return self._degraded_emojis(message, reason), True
+            self.degraded_mode.observe(time.perf_counter() - start)
+
+            with tracer.start_span("parse_emojis") as span:
+                emojis = self._extract_emojis(response)
+                span.set_attribute("emoji.count", len(emojis))
+
+            if not emojis:
+                return self._degraded_emojis(message, "parse_failure"), True
+            emoji_generations_total.inc(mode="llm")
+            # Limit to reasonable number of emojis
+            return emojis[:5], False
+
+        except Exception as e:
+            logger.error(f"Emoji generation error: {str(e)}")
+            return self._degraded_emojis(message, "error"), True
+
+    def _degraded_emojis(self, message: str, reason: str) -> List[str]:
+        """Emojis from the heuristic engine, counted as a degraded generation."""
+        emoji_generations_total.inc(mode="degraded")
+        emoji_degraded_total.inc(reason=reason)
+        with tracer.start_span("heuristic_emojis", attributes={"degraded.reason": reason}):
+            return heuristic_emojis.suggest(message)
+
+    @traced("generation")
+    async def generate_emojis_in_context(self, message: str, conversation: Conversation) -> Tuple[List[str], bool]:
+        """
+        Generate emojis for a message in the context of its conversation.
+
+        The first turn of a session (or the first after its context was reset)
+        seeds the Ollama context with the instructions and the recent messages.
+        Later turns only send the new message along with the returned context,
+        so Ollama evaluates just the new tokens. A degraded turn, whether
+        degraded mode skipped the LLM or the LLM failed, is recorded without
+        context, so the next LLM turn re-seeds it.
+
         Returns:
-            List of emoji strings
+            Tuple of (emojis, degraded)
         """
-        emoji_prompt = f"""
-You are an emoji expert. Given the following message, suggest 3-5 appropriate emojis that best represent the emotion, content, or context of the message.
+        async with conversation.lock:
+            reason = self.degraded_mode.reason()
+            if reason is not None:
+                return self._degraded_turn(message, conversation, reason), True
+
+            # A context from another server or model, e.g. before a reload, cannot be continued
+            if conversation.context is not None and conversation.context_source != self.context_source:
+                conversation.reset_context()
+
+            if conversation.context is None:
+                template = CONVERSATION_PROMPT
+                prompt = (
+                    CONVERSATION_PROMPT.render()
+                    + "".join(CONVERSATION_HISTORY_PROMPT.render(earlier) for earlier, _ in conversation.messages)
+                    + CONVERSATION_TURN_PROMPT.render(message)
+                )
+            else:
+                template = CONVERSATION_TURN_PROMPT
+                prompt = CONVERSATION_TURN_PROMPT.render(message)
+
+            try:
+                start = time.perf_counter()
+                response = await self._request(template, prompt, context=conversation.context)
+                if response is None:
+                    logger.warning("Context-aware emoji generation failed, returning heuristic emojis")
+                    reason = "circuit_open" if self.circuit_breaker.is_open() else "llm_error"
+                    return self._degraded_turn(message, conversation, reason), True
+                self.degraded_mode.observe(time.perf_counter() - start)
+
+                with tracer.start_span("parse_emojis") as span:
+                    emojis = self._extract_emojis(response['response'])
+                    span.set_attribute("emoji.count", len(emojis))
+                degraded = not emojis
+                if degraded:
+                    emojis = self._degraded_emojis(message, "parse_failure")
+                else:
+                    emoji_generations_total.inc(mode="llm")
+                    emojis = emojis[:5]
+
+                conversation.record(message, emojis, response.get('context'), self.context_source)
+                logger.info(f"Session {conversation.session_id} turn {conversation.turns}: "
+                            f"{response.get('prompt_eval_count')} prompt tokens evaluated, "
+                            f"{conversation.memory_bytes()} bytes held")
+                return emojis, degraded
+
+            except Exception as e:
+                logger.error(f"Context-aware emoji generation error: {str(e)}")
+                return self._degraded_turn(message, conversation, "error"), True
+
+    def _degraded_turn(self, message: str, conversation: Conversation, reason: str) -> List[str]:
+        """Heuristic emojis for a conversation turn, recorded without context."""
+        emojis = self._degraded_emojis(message, reason)
+        conversation.record(message, emojis, None)
+        return emojis
 
-Message: "{message}"
+    async def stream_emojis(self, message: str) -> AsyncIterator[Tuple[str, bool]]:
+        """
+        Generate emojis for the given message, yielding each one as soon as
+        the LLM has produced it. Heuristic emojis are yielded instead, all at
+        once, in the same cases as for `generate_emojis`.
 
-Respond with only the emojis, separated by spaces. Do not include any other text or explanations.
-Examples:
-- For "I'm so happy today!" respond with: "😊 😄 🎉"
-- For "It's raining outside" respond with: "🌧️ ☔ 🌦️"
-- For "I love pizza" respond with: "🍕 ❤️ 😋"
+        Yields:
+            Tuples of (emoji, degraded), at most 5 and without duplicates
+        """
+        reason = self.degraded_mode.reason()
+        if reason is None and not self.circuit_breaker.allow():
+            reason = "circuit_open"
+            llm_requests_total.inc(template=EMOJI_PROMPT.template_id, template_version=str(EMOJI_PROMPT.version),
+                                   outcome="circuit_open")
+        if reason is not None:
+            for emoji in self._degraded_emojis(message, reason):
+                yield emoji, True
+            return
+
+        emoji_prompt = EMOJI_PROMPT.render(message)
+        emitted: List[str] = []
+        buffer = ""
+        attributes = {
+            "gen_ai.system": "ollama",
+            "gen_ai.request.model": self.model,
+            "server.address": self.base_url,
+            "prompt.template": EMOJI_PROMPT.key,
+        }
+
+        # Not activated, as the active span must not change across yields
+        failed = False
+        finished = False
+        stream = None
+        start = time.perf_counter()
+        with self.in_use(), \
+                tracer.start_span("generation.stream", kind="CLIENT", attributes=attributes, activate=False) as span:
+            try:
+                logger.info(f"Making streaming LLM request to {self.base_url} with model {self.model}")
+                stream = await self.client.generate(
+                    model=self.model,
+                    prompt=emoji_prompt,
+                    stream=True,
+                    options=self.options
+                )
+
+                async for chunk in stream:
+                    buffer += chunk.get('response') or ''
+                    if chunk.get('done'):
+                        span.set_attribute("gen_ai.usage.input_tokens", chunk.get('prompt_eval_count'))
+                        span.set_attribute("gen_ai.usage.output_tokens", chunk.get('eval_count'))
+                        span.set_attribute("ollama.total_duration_ns", chunk.get('total_duration'))
+                        span.set_attribute("ollama.load_duration_ns", chunk.get('load_duration'))
+                        span.set_attribute("ollama.eval_duration_ns", chunk.get('eval_duration'))
+                        span.set_attribute("ollama.model_loaded", usage_tracker.record(self.model, chunk))
+
+                    if len(emitted) >= 5:
+                        # Keep reading to the final chunk, which carries the usage of the call
+                        buffer = ""
+                        continue
+
+                    # Only whitespace-terminated items are complete, keep the tail
+                    items = buffer.split()
+                    if buffer and not buffer[-1].isspace():
+                        buffer = items.pop()
+                    else:
+                        buffer = ""
+
+                    for emoji in self._extract_emojis(" ".join(items)):
+                        if emoji not in emitted and len(emitted) < 5:
+                            emitted.append(emoji)
+                            yield emoji, False
+
+                for emoji in self._extract_emojis(buffer):
+                    if emoji not in emitted and len(emitted) < 5:
+                        emitted.append(emoji)
+                        yield emoji, False
+
+                self.circuit_breaker.record_success()
+                self.degraded_mode.observe(time.perf_counter() - start)
+                finished = True
+
+            except Exception as e:
+                failed = True
+                self.circuit_breaker.record_failure()
+                span.set_status("ERROR", str(e))
+                logger.error(f"Streaming emoji generation error: {str(e)}", exc_info=True)
+            finally:
+                # Release the HTTP response now rather than when the stream is garbage collected,
+                # also when the consumer stops early
+                if stream is not None and hasattr(stream, "aclose"):
+                    await stream.aclose()
+                # Counted as an error when the consumer stops early, as a cancelled call is in `_request`
+                llm_requests_total.inc(template=EMOJI_PROMPT.template_id,
+                                       template_version=str(EMOJI_PROMPT.version),
+                                       outcome="error" if failed or not finished else "success")
+                llm_request_duration_seconds.observe(
+                    time.perf_counter() - start,
+                    template=EMOJI_PROMPT.template_id,
+                    template_version=str(EMOJI_PROMPT.version)
+                )
+
+            span.set_attribute("emoji.count", len(emitted))
+
+        if emitted:
+            emoji_generations_total.inc(mode="llm")
+        else:
+            logger.warning("Streaming emoji generation produced no emojis, returning heuristic emojis")
+            for emoji in self._degraded_emojis(message, "llm_error" if failed else "parse_failure"):
+                yield emoji, True
+
+    def _extract_emojis(self, response: str) -> List[str]:
+        """
+        Extract the unique emojis, in order of appearance, from an LLM response.
 
-Your response:
-"""
+        Returns:
+            List of emoji strings (possibly empty)
+        """
+        # First try splitting by spaces to handle space-separated emojis
+        potential_emojis = response.split()
+        emojis = []
 
-        try:
-            response = await self._make_request(emoji_prompt)
-            if response is None:
-                logger.warning("Emoji generation failed, returning default emojis")
-                return ["😊", "👍"]
-
-            # Extract emojis from the response
-            # First try splitting by spaces to handle space-separated emojis
-            potential_emojis = response.split()
-            emojis = []
-
-            for item in potential_emojis:
-                # Clean the item and check if it's not empty
-                cleaned_item = item.strip()
-                if not cleaned_item:
-                    continue
-
-                # Check if the item contains emoji characters
-                has_emoji = False
-                for char in cleaned_item:
-                    code_point = ord(char)
-                    # Check for common emoji Unicode ranges
-                    if (0x1F600 <= code_point <= 0x1F64F or  # Emoticons
-                        0x1F300 <= code_point <= 0x1F5FF or  # Misc Symbols and Pictographs
-                        0x1F680 <= code_point <= 0x1F6FF or  # Transport and Map
-                        0x1F1E0 <= code_point <= 0x1F1FF or  # Regional indicators
-                        0x2600 <= code_point <= 0x26FF or   # Misc symbols
-                        0x2700 <= code_point <= 0x27BF or   # Dingbats
-                        0xFE00 <= code_point <= 0xFE0F or   # Variation selectors
-                        code_point == 0x200D):              # Zero-width joiner
-                        has_emoji = True
-                        break
-
-                if has_emoji and not self._is_emoji_modifier_only(cleaned_item):
-                    # If the item looks like it contains multiple emojis, split it
-                    # We use a simple heuristic: if it's longer than 2 characters, it might be multiple emojis
-                    if len(cleaned_item) > 2:
-                        split_emojis = self._split_emoji_string(cleaned_item)
-                        if len(split_emojis) > 1:
-                            # Successfully split into multiple emojis
-                            emojis.extend(split_emojis)
-                        else:
-                            # Couldn't split or only one emoji, add as is
-                            emojis.append(cleaned_item)
+        for item in potential_emojis:
+            # Clean the item and check if it's not empty
+            cleaned_item = item.strip()
+            if not cleaned_item:
+                continue
+
+            # Check if the item contains emoji characters
+            has_emoji = False
+            for char in cleaned_item:
+                code_point = ord(char)
+                # Check for common emoji Unicode ranges
+                if (0x1F600 <= code_point <= 0x1F64F or  # Emoticons
+                    0x1F300 <= code_point <= 0x1F5FF or  # Misc Symbols and Pictographs
+                    0x1F680 <= code_point <= 0x1F6FF or  # Transport and Map
+                    0x1F1E0 <= code_point <= 0x1F1FF or  # Regional indicators
+                    0x2600 <= code_point <= 0x26FF or   # Misc symbols
+                    0x2700 <= code_point <= 0x27BF or   # Dingbats
+                    0xFE00 <= code_point <= 0xFE0F or   # Variation selectors
+                    code_point == 0x200D):              # Zero-width joiner
+                    has_emoji = True
+                    break
+
+            if has_emoji and not self._is_emoji_modifier_only(cleaned_item):
+                # If the item looks like it contains multiple emojis, split it
+                # We use a simple heuristic: if it's longer than 2 characters, it might be multiple emojis
+                if len(cleaned_item) > 2:
+                    split_emojis = self._split_emoji_string(cleaned_item)
+                    if len(split_emojis) > 1:
+                        # Successfully split into multiple emojis
+                        emojis.extend(split_emojis)
                     else:
+                        # Couldn't split or only one emoji, add as is
                         emojis.append(cleaned_item)
+                else:
+                    emojis.append(cleaned_item)
 
-            # Filter out empty strings and whitespace before removing duplicates
-            emojis = [emoji for emoji in emojis if emoji and emoji.strip()]
+        # Filter out empty strings and whitespace before removing duplicates
+        emojis = [emoji for emoji in emojis if emoji and emoji.strip()]
 
-            # Remove duplicates while preserving order
-            unique_emojis = []
-            for emoji in emojis:
-                if emoji not in unique_emojis:
-                    unique_emojis.append(emoji)
+        # Remove duplicates while preserving order
+        unique_emojis = []
+        for emoji in emojis:
+            if emoji not in unique_emojis:
+                unique_emojis.append(emoji)
 
-            # Limit to reasonable number of emojis
-            return unique_emojis[:5] if unique_emojis else ["😊", "👍"]
-
-        except Exception as e:
-            logger.error(f"Emoji generation error: {str(e)}")
-            return ["😊", "👍"]  # Fallback emojis
+        return unique_emojis
 
+    @traced("sample_generation")
     async def generate_sample_sentence(self) -> str:
         """
         Generate a short inspirational sentence to use as inspiration for users.
@@ -272,26 +728,8 @@ Your response:
         Returns:
             A short inspirational sentence
         """
-        sample_prompt = """
-You are a creative writing assistant. Generate a short, single sentence that would make good candiate for an emoji-reaction.
-
-The sentence should be:
-- 5-15 words long
-- Suitable for all ages
-- Not too specific to any particular situation
-
-Examples of good inspirational sentences:
-- "Today feels like a day full of possibilities!"
-- "I'm grateful for the little moments that make me smile."
-- "There's something magical about discovering new things."
-- "I love how music can change my entire mood."
-- "Sometimes the best adventures happen close to home."
-
-Generate ONE inspirational sentence following these guidelines. Respond with only the sentence, no quotes or additional text.
-"""
-
         try:
-            response = await self._make_request(sample_prompt)
+            response = await self._make_request(SAMPLE_PROMPT)
             if response is None:
                 logger.warning("Sample generation failed, returning default sample")
                 return "Today is a great day to share something positive!"
@@ -322,6 +760,29 @@ Generate ONE inspirational sentence following these guidelines. Respond with onl
             return "Today is a great day to share something positive!"  # Fallback sample
 
 
-# Global LLM client instance
-llm_client = LLMClient()
+def rebuild_llm_client(config: Settings) -> Callable[[], None]:
+    """
+    Build the LLM client for reloaded settings, reusing the unaffected parts of the current one.
+
+    Returns:
+        Function that makes the new client current
+    """
+    previous = llm_client.current_instance()
+    client = LLMClient(config, previous)
+
+    def commit():
+        llm_client.swap_instance(client)
+        task = asyncio.ensure_future(previous.close(successor=client))
+        _closing.add(task)
+        task.add_done_callback(_closing.discard)
+
+    return commit
+
+
+# Replaced clients waiting for their calls in flight before closing
+_closing: Set[asyncio.Future] = set()
+
+
+# Global LLM client, replaced by a new instance when its settings are reloaded
+llm_client: Current[LLMClient] = Current(LLMClient(settings.current_instance()))
 
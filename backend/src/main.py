@@ -1,15 +1,33 @@
 """FastAPI backend server for emoji chat application."""
 
+import asyncio
+import hmac
 import logging
+import signal
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, Request
+from typing import Any, Dict, List, Literal, Optional
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
 
 from config import settings
-from models import MessageRequest, EmojiResponse, ErrorResponse, HealthResponse, SampleResponse
-from llm_client import llm_client
+from models import (
+    MessageRequest, EmojiResponse, ErrorResponse, HealthResponse, SampleResponse,
+    LivenessResponse, ReadinessResponse, JobRequest, JobResponse, JobStatsResponse,
+    ConversationStatsResponse, ConfigReloadResponse, UsageResponse
+)
+from llm_client import LLMClient, llm_client, LLM_SETTINGS, ModerationUnavailableError, rebuild_llm_client
+from config_reload import ConfigReloader
+from chat_session import ChatSession
+from responses import ORJSONResponse
+from metrics import metrics
+from prompts import prompts
+from health import ReadinessProber
+from jobs import JobQueue, QueueFullError
+from conversation import conversations
+from tracing import tracer, TraceContextFilter
+from usage import api_caller, calls_for, usage_tracker
 
 # Configure logging for container environments
 import sys
@@ -18,7 +36,7 @@ import sys
 log_level = getattr(logging, settings.log_level, logging.INFO)
 logging.basicConfig(
     level=log_level,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    format="%(asctime)s - %(name)s - %(levelname)s - [trace=%(trace_id)s] %(message)s",
     handlers=[
         logging.StreamHandler(sys.stdout)  # Explicitly use STDOUT
     ],
@@ -28,6 +46,9 @@ logging.basicConfig(
 # Ensure logs are flushed immediately (important for containers)
 logging.getLogger().handlers[0].flush = sys.stdout.flush
 
+# Tag every log line with the trace ID of the request it belongs to
+logging.getLogger().handlers[0].addFilter(TraceContextFilter())
+
 # Set unbuffered output for containers
 sys.stdout.reconfigure(line_buffering=True)
 sys.stderr.reconfigure(line_buffering=True)
@@ -37,6 +58,70 @@ logger = logging.getLogger(__name__)
 # Test logging immediately
 logger.info("🔧 Logging system initialized - this message should be visible in container logs")
 
+# Background prober that backs the readiness endpoint
+readiness_prober = ReadinessProber(
+    llm_client,
+    interval=settings.readiness_probe_interval,
+    timeout=settings.readiness_probe_timeout,
+    max_staleness=settings.readiness_max_staleness,
+    serve_degraded=settings.readiness_serve_degraded
+)
+
+
+def build_health_response() -> HealthResponse:
+    return HealthResponse(
+        status="healthy",
+        llm_url=settings.llm_url,
+        llm_model=settings.llm_model,
+        content_moderation_enabled=True,  # Always available, controlled by user
+        moderation_model=settings.moderation_model or settings.llm_model
+    )
+
+
+# The health response only changes on a config reload, so it is built once per reload
+health_response = build_health_response()
+liveness_response = LivenessResponse(status="alive")
+
+
+def rebuild_health_response(config):
+    def commit():
+        global health_response
+        health_response = build_health_response()
+    return commit
+
+
+def reset_conversation_contexts(config):
+    """Drop the conversation contexts, which the new server or model cannot continue."""
+    def commit():
+        reset = conversations.reset_contexts()
+        logger.info(f"LLM server or model changed, dropped the context of {reset} conversation(s)")
+    return commit
+
+
+# Applies changes of the settings at runtime. Settings not subscribed here need a restart.
+config_reloader = ConfigReloader(settings.config_file, settings.config_watch_interval)
+config_reloader.subscribe(LLM_SETTINGS, rebuild_llm_client)
+config_reloader.subscribe(["llm_url", "llm_model", "moderation_model"], rebuild_health_response)
+config_reloader.subscribe(["llm_url", "llm_model"], reset_conversation_contexts)
+# Read on every request
+config_reloader.subscribe(["job_max_wait", "ws_max_concurrent_messages", "ws_max_pending_messages", "admin_token"])
+
+
+def reload_on_sighup():
+    """Reload the settings when the process receives SIGHUP, where the platform supports it."""
+    if not hasattr(signal, "SIGHUP"):
+        return
+
+    def handle():
+        task = asyncio.ensure_future(config_reloader.reload("signal"))
+        # Failures are logged by the reloader
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, handle)
+    except (NotImplementedError, RuntimeError, ValueError):
+        logger.warning("Cannot reload the configuration on SIGHUP in this event loop")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
@@ -61,12 +146,22 @@ async def lifespan(app: FastAPI):
         logger.error(f"❌ LLM connection failed: {str(e)}")
         logger.error("The application will start but LLM features may not work properly")
 
+    readiness_prober.start()
+    job_queue.start()
+    config_reloader.start()
+    reload_on_sighup()
+
     logger.info("🎉 Application startup complete!")
 
     yield
 
     # Shutdown
     logger.info("🛑 Application shutting down...")
+    await config_reloader.stop()
+    await job_queue.stop()
+    await readiness_prober.stop()
+    await llm_client.close(timeout=settings.api_timeout)
+    tracer.shutdown()
 
 # Create FastAPI app
 app = FastAPI(
@@ -86,6 +181,32 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Run each request in a server span, continuing the caller's trace from its traceparent header."""
+    attributes = {
+        "http.request.method": request.method,
+        "url.path": request.url.path,
+        "user_agent.original": request.headers.get("user-agent"),
+    }
+    with tracer.start_span(
+        f"{request.method} {request.url.path}",
+        kind="SERVER",
+        attributes=attributes,
+        traceparent=request.headers.get("traceparent")
+    ) as span, calls_for(api_caller(request.url.path, request.headers.get("x-client-id"))):
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if route is not None:
+            span.name = f"{request.method} {route.path}"
+            span.set_attribute("http.route", route.path)
+        span.set_attribute("http.response.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.set_status("ERROR")
+        response.headers["traceparent"] = span.traceparent
+        return response
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler."""
@@ -102,25 +223,61 @@ async def global_exception_handler(request: Request, exc: Exception):
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint."""
-    return HealthResponse(
-        status="healthy",
-        llm_url=settings.llm_url,
-        llm_model=settings.llm_model,
-        content_moderation_enabled=True,  # Always available, controlled by user
-        moderation_model=settings.moderation_model or settings.llm_model
-    )
+    return health_response
 
 
-@app.post("/api/emojis", response_model=EmojiResponse)
-async def generate_emojis(request: MessageRequest):
+@app.get("/health/live", response_model=LivenessResponse)
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests. Never checks the LLM."""
+    return liveness_response
+
+
+@app.get("/health/ready", response_model=ReadinessResponse, responses={503: {"model": ReadinessResponse}})
+async def readiness_check():
     """
-    Generate emojis for a given message.
+    Readiness probe backed by the cached result of the background LLM prober.
 
-    This endpoint:
-    1. Validates the message parameter for reasonable size
-    2. Optionally checks content moderation (if not disabled by user)
-    3. Generates appropriate emojis using the LLM
+    Returns 503 when the LLM server is down, is missing a configured model,
+    cannot generate, or when the last probe result is stale.
+    """
+    status = readiness_prober.status()
+    if not status.ready:
+        return JSONResponse(status_code=503, content=status.model_dump(mode="json"))
+    return status
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Metrics in the Prometheus text exposition format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/prompts", response_class=ORJSONResponse)
+async def get_prompts():
+    """Versioned keys of the prompt templates in use."""
+    return prompts.versions()
+
+
+async def process_message(request: MessageRequest) -> Dict[str, Any]:
+    """
+    Moderate a message (unless disabled by the user) and generate its emojis.
+
+    Shared by the synchronous endpoint and the job queue workers.
+
+    Returns:
+        The fields of an EmojiResponse as a dict
+
+    Raises:
+        HTTPException: If the message fails moderation or processing fails
     """
+    # Moderation and generation use the same client, even if the settings are reloaded in between,
+    # and the client is not closed by a reload until both are done
+    with llm_client.current_instance().in_use() as client:
+        return await moderate_and_generate(request, client)
+
+
+async def moderate_and_generate(request: MessageRequest, client: LLMClient) -> Dict[str, Any]:
+    """Moderate a message and generate its emojis with the given client, see `process_message`."""
     try:
         message = request.message
         disable_moderation = request.disable_moderation
@@ -133,7 +290,7 @@ async def generate_emojis(request: MessageRequest):
         if should_moderate:
             logger.info("Starting content moderation check...")
             try:
-                is_safe, reason = await llm_client.moderate_content(message)
+                is_safe, reason = await client.moderate_content(message)
                 moderation_passed = is_safe
                 logger.info(f"Moderation result: safe={is_safe}, reason={reason}")
 
@@ -148,6 +305,15 @@ async def generate_emojis(request: MessageRequest):
             except HTTPException:
                 # Re-raise HTTP exceptions (moderation failures)
                 raise
+            except ModerationUnavailableError as e:
+                if not client.moderation_fail_open:
+                    logger.warning(f"Rejecting message, {str(e)}")
+                    raise HTTPException(
+                        status_code=503,
+                        detail="Content moderation is temporarily unavailable, please try again later",
+                        headers={"Retry-After": "5"}
+                    )
+                logger.warning(f"{str(e)}, serving the message unmoderated")
             except Exception as e:
                 logger.error(f"Error during content moderation: {str(e)}", exc_info=True)
                 raise HTTPException(
@@ -160,8 +326,12 @@ async def generate_emojis(request: MessageRequest):
         # Generate emojis
         logger.info("Starting emoji generation...")
         try:
-            emojis = await llm_client.generate_emojis(message)
-            logger.info(f"LLM returned emojis: {emojis}")
+            if request.session_id:
+                conversation = conversations.get(request.session_id)
+                emojis, degraded = await client.generate_emojis_in_context(message, conversation)
+            else:
+                emojis, degraded = await client.generate_emojis(message)
+            logger.info(f"{'Heuristic engine' if degraded else 'LLM'} returned emojis: {emojis}")
 
             if not emojis:
                 logger.warning("No emojis generated, using fallback")
@@ -175,11 +345,12 @@ async def generate_emojis(request: MessageRequest):
                 detail=f"Emoji generation failed: {str(e)}"
             )
 
-        return EmojiResponse(
-            emojis=emojis,
-            message=message,
-            moderation_passed=moderation_passed
-        )
+        return {
+            "emojis": emojis,
+            "message": message,
+            "moderation_passed": moderation_passed,
+            "degraded": degraded
+        }
 
     except HTTPException:
         # Re-raise HTTP exceptions
@@ -192,6 +363,121 @@ async def generate_emojis(request: MessageRequest):
         )
 
 
+# Fixed pool of workers serving asynchronous emoji jobs
+job_queue = JobQueue(
+    process_message,
+    workers=settings.job_workers,
+    max_size=settings.job_queue_max_size,
+    result_ttl=settings.job_result_ttl
+)
+# Serve heuristic emojis instead of letting queued jobs wait too long for the LLM
+llm_client.degraded_mode.watch_queue(job_queue.oldest_age)
+
+
+@app.post("/api/emojis", response_model=EmojiResponse)
+async def generate_emojis(request: MessageRequest):
+    """
+    Generate emojis for a given message.
+
+    This endpoint:
+    1. Validates the message parameter for reasonable size
+    2. Optionally checks content moderation (if not disabled by user)
+    3. Generates appropriate emojis using the LLM
+    """
+    # Every field is built from already validated values, so skip
+    # re-validating against EmojiResponse and serialize directly
+    return ORJSONResponse(await process_message(request))
+
+
+@app.post("/api/jobs", response_model=JobResponse, status_code=202,
+          responses={503: {"model": ErrorResponse}})
+async def submit_job(request: JobRequest, response: Response):
+    """
+    Queue a message for asynchronous emoji generation.
+
+    Returns a job ID immediately. Poll `GET /api/jobs/{job_id}` for the result,
+    optionally with `?wait=<seconds>` to long-poll until the job finishes.
+    """
+    try:
+        job = job_queue.submit(request)
+    except QueueFullError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+    logger.info(f"Queued job {job.id} (priority {request.priority})")
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return job.to_response()
+
+
+@app.get("/api/jobs/stats", response_model=JobStatsResponse)
+async def get_job_stats():
+    """Job queue depth, oldest job age and worker utilization, e.g. for autoscaling."""
+    return job_queue.stats()
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse, responses={404: {"model": ErrorResponse}})
+async def get_job(job_id: str, wait: float = Query(0, ge=0, description="Seconds to wait for the job to finish")):
+    """Get the status of a job, and its result once finished."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or its result has expired")
+
+    await job_queue.wait(job, min(wait, settings.job_max_wait))
+    return job.to_response()
+
+
+@app.get("/api/sessions/stats", response_model=ConversationStatsResponse)
+async def get_session_stats():
+    """Number of conversation sessions and the memory they hold."""
+    return conversations.stats()
+
+
+@app.delete("/api/sessions/{session_id}", status_code=204)
+async def delete_session(session_id: str):
+    """Forget a session's conversation, so its next message starts fresh."""
+    if not conversations.discard(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return Response(status_code=204)
+
+
+@app.get("/api/usage", response_model=UsageResponse)
+async def get_usage(
+    group_by: List[Literal["endpoint", "model", "client"]] = Query(
+        ["endpoint", "model", "client"],
+        description="Dimensions to break the usage down by"
+    )
+):
+    """
+    LLM tokens and time since startup, by API endpoint, model and client.
+
+    The client is the `X-Client-Id` request header. Comparing the prompt
+    evaluation, generation and model load times shows whether the LLM cost
+    comes from prompt length, output length or model swapping.
+    """
+    return usage_tracker.report(group_by)
+
+
+@app.post("/api/admin/reload", response_model=ConfigReloadResponse,
+          responses={400: {"model": ErrorResponse}, 403: {"model": ErrorResponse}})
+async def reload_config(x_admin_token: Optional[str] = Header(None)):
+    """
+    Reload the settings from the environment, `.env` and the config file.
+
+    Requires the `X-Admin-Token` header to match ADMIN_TOKEN, and is disabled
+    while ADMIN_TOKEN is unset. If the new settings are invalid, nothing
+    changes and 400 is returned.
+    """
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled, ADMIN_TOKEN is not set")
+    if not hmac.compare_digest((x_admin_token or "").encode(), settings.admin_token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+    try:
+        return await config_reloader.reload("api")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Configuration not reloaded: {str(e)}")
+
+
 @app.get("/api/sample", response_model=SampleResponse)
 async def get_sample():
     """
@@ -208,7 +494,7 @@ async def get_sample():
 
         logger.info(f"Generated sample: {sample}")
 
-        return SampleResponse(sample=sample)
+        return ORJSONResponse({"sample": sample})
 
     except Exception as e:
         logger.error(f"Error generating sample: {str(e)}")
@@ -218,7 +504,27 @@ async def get_sample():
         )
 
 
-@app.get("/")
+@app.websocket("/api/ws")
+async def chat_websocket(websocket: WebSocket):
+    """
+    Chat over a persistent WebSocket connection.
+
+    The client sends `{"id": ..., "message": ..., "disable_moderation": ...}`
+    frames and may have several messages outstanding at once. Emojis are
+    streamed back as they are generated, tagged with the message ID.
+    """
+    await websocket.accept()
+    logger.info("Chat WebSocket connected")
+    session = ChatSession(
+        websocket,
+        max_concurrent=settings.ws_max_concurrent_messages,
+        max_pending=settings.ws_max_pending_messages
+    )
+    with calls_for(api_caller(websocket.url.path, websocket.headers.get("x-client-id"))):
+        await session.run()
+
+
+@app.get("/", response_class=ORJSONResponse)
 async def root():
     """Root endpoint."""
     return {
@@ -226,7 +532,16 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
+            "liveness": "/health/live",
+            "readiness": "/health/ready",
             "generate_emojis": "/api/emojis",
+            "chat_websocket": "/api/ws",
+            "jobs": "/api/jobs",
+            "sessions": "/api/sessions/stats",
+            "prompts": "/api/prompts",
+            "usage": "/api/usage",
+            "reload_config": "/api/admin/reload",
+            "metrics": "/metrics",
             "sample": "/sample"
         }
     }
@@ -1,6 +1,7 @@
 """Pydantic models for request and response validation."""
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, field_validator
+from datetime import datetime
 from typing import List, Optional
 from config import settings
 
@@ -18,9 +19,17 @@ class MessageRequest(BaseModel):
         False,
         description="Whether to disable content moderation for this request (default: False)"
     )
+    session_id: Optional[str] = Field(
+        None,
+        min_length=1,
+        max_length=100,
+        pattern=r"^[A-Za-z0-9_-]+$",
+        description="Chat session ID. When set, emojis are chosen in the context of the session's recent messages"
+    )
 
-    @validator('message')
-    def validate_message(cls, v):
+    @field_validator('message')
+    @classmethod
+    def validate_message(cls, v: str) -> str:
         """Validate message content."""
         if not v or not v.strip():
             raise ValueError("Message cannot be empty or only whitespace")
@@ -32,6 +41,17 @@ class MessageRequest(BaseModel):
         return v.strip()
 
 
+class ChatSocketMessage(MessageRequest):
+    """Message sent by the client over the chat WebSocket."""
+
+    id: str = Field(
+        ...,
+        min_length=1,
+        max_length=100,
+        description="Client-chosen message ID, echoed back on every frame about this message"
+    )
+
+
 class EmojiResponse(BaseModel):
     """Response model for emoji generation."""
 
@@ -47,6 +67,104 @@ class EmojiResponse(BaseModel):
         None,
         description="Whether the message passed content moderation (if enabled)"
     )
+    degraded: bool = Field(
+        False,
+        description="Whether the emojis came from the local heuristic engine instead of the LLM"
+    )
+
+
+class JobRequest(MessageRequest):
+    """Request model for asynchronous emoji generation."""
+
+    priority: int = Field(
+        5,
+        ge=0,
+        le=9,
+        description="Job priority, lower values are processed first (default: 5)"
+    )
+
+
+class JobResponse(BaseModel):
+    """Status, and once finished the result, of an asynchronous emoji generation job."""
+
+    job_id: str = Field(..., description="Job ID to poll for the result")
+    status: str = Field(..., description="One of 'queued', 'running', 'succeeded' or 'failed'")
+    created_at: datetime = Field(..., description="When the job was submitted")
+    result: Optional[EmojiResponse] = Field(None, description="The emojis, once the job has succeeded")
+    error: Optional[str] = Field(None, description="Why the job failed")
+    status_code: Optional[int] = Field(None, description="HTTP status the synchronous endpoint would have returned for the failure")
+
+
+class JobStatsResponse(BaseModel):
+    """Job queue statistics, e.g. for autoscaling."""
+
+    queue_depth: int = Field(..., description="Jobs waiting in the queue")
+    oldest_job_age_seconds: float = Field(..., description="Age of the oldest queued job")
+    workers: int = Field(..., description="Number of job workers")
+    workers_busy: int = Field(..., description="Workers currently processing a job")
+    worker_utilization: float = Field(..., description="Fraction of workers currently busy")
+    max_queue_size: int = Field(..., description="Jobs that can be queued before submissions are rejected")
+
+
+class ConversationStatsResponse(BaseModel):
+    """Conversation memory statistics."""
+
+    sessions: int = Field(..., description="Conversation sessions held in memory")
+    memory_bytes: int = Field(..., description="Approximate memory held by all sessions")
+    max_session_memory_bytes: int = Field(..., description="Approximate memory held by the largest session")
+    session_memory_cap_bytes: int = Field(..., description="Memory cap per session")
+    max_sessions: int = Field(..., description="Sessions kept before the least recently used is evicted")
+
+
+class UsageStats(BaseModel):
+    """Ollama usage summed over a set of LLM calls."""
+
+    calls: int = Field(..., description="LLM calls that returned usage data")
+    prompt_tokens: int = Field(..., description="Prompt tokens evaluated")
+    output_tokens: int = Field(..., description="Tokens generated")
+    total_seconds: float = Field(..., description="Time Ollama spent on the calls")
+    load_seconds: float = Field(..., description="Part of the time spent loading the model")
+    prompt_eval_seconds: float = Field(..., description="Part of the time spent evaluating prompts")
+    eval_seconds: float = Field(..., description="Part of the time spent generating output")
+    model_loads: int = Field(..., description="Calls that had to load the model first")
+
+
+class UsageGroup(UsageStats):
+    """Usage of one endpoint, model and client combination. Dimensions not grouped by are null."""
+
+    endpoint: Optional[str] = Field(None, description="API endpoint that caused the calls")
+    model: Optional[str] = Field(None, description="Ollama model called")
+    client: Optional[str] = Field(None, description="Client ID from the X-Client-Id header")
+
+
+class ModelLoad(BaseModel):
+    """An LLM call that had to load the model first."""
+
+    at: datetime = Field(..., description="When the call finished")
+    endpoint: str = Field(..., description="API endpoint that caused the call")
+    model: str = Field(..., description="Ollama model loaded")
+    client: str = Field(..., description="Client ID from the X-Client-Id header")
+    load_seconds: float = Field(..., description="Time spent loading the model")
+
+
+class UsageResponse(BaseModel):
+    """LLM usage since the server started."""
+
+    since: datetime = Field(..., description="When usage accounting started")
+    totals: UsageStats = Field(..., description="Usage of all calls")
+    groups: List[UsageGroup] = Field(..., description="Usage by the requested dimensions, most expensive first")
+    recent_model_loads: List[ModelLoad] = Field(..., description="Most recent calls that loaded the model, newest first")
+
+
+class ConfigReloadResponse(BaseModel):
+    """Result of a configuration reload."""
+
+    version: int = Field(..., description="Configuration version, incremented on every reload that changed a setting")
+    changed: List[str] = Field(..., description="Settings whose value changed")
+    restart_required: List[str] = Field(
+        ...,
+        description="Changed settings that only take effect after a restart"
+    )
 
 
 class ErrorResponse(BaseModel):
@@ -73,3 +191,21 @@ class HealthResponse(BaseModel):
     llm_model: str = Field(..., description="Configured LLM model")
     content_moderation_enabled: bool = Field(..., description="Whether content moderation is enabled")
     moderation_model: Optional[str] = Field(None, description="Model used for content moderation")
+
+
+class LivenessResponse(BaseModel):
+    """Liveness probe response model."""
+
+    status: str = Field(..., description="Always 'alive' while the process serves requests")
+
+
+class ReadinessResponse(BaseModel):
+    """Readiness probe response model, from the last background probe of the LLM server."""
+
+    status: str = Field(..., description="One of 'starting', 'ready', 'degraded', 'not_ready' or 'stale'")
+    ready: bool = Field(..., description="Whether the service can handle requests")
+    model_available: Optional[bool] = Field(None, description="Whether the configured models are present on the LLM server")
+    generation_ok: Optional[bool] = Field(None, description="Whether a one-token test generation succeeded")
+    probe_latency_ms: Optional[float] = Field(None, description="Duration of the last probe in milliseconds")
+    checked_at: Optional[datetime] = Field(None, description="When the last probe completed")
+    detail: Optional[str] = Field(None, description="Why the service is not ready")
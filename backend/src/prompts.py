@@ -0,0 +1,167 @@
+"""Versioned prompt templates for the LLM client."""
+
+import hashlib
+from typing import Dict, Optional
+
+# Placeholder for the user message in template text
+MESSAGE_SLOT = "{message}"
+
+# JSON string escapes for the characters that could end the quoted message
+# section of a prompt. Backslash must come first.
+_ESCAPES = (
+    ("\\", "\\\\"),
+    ('"', '\\"'),
+    ("\n", "\\n"),
+    ("\r", "\\r"),
+    ("\t", "\\t"),
+)
+
+
+def escape_user_input(text: str) -> str:
+    """
+    Escape user input for embedding between double quotes in a prompt.
+
+    Backslashes, quotes and line breaks are escaped the same way as in a JSON
+    string, so a message cannot close the quoted section or start new lines of
+    instructions. Emojis and other non-ASCII characters are left as is.
+    """
+    for char, escaped in _ESCAPES:
+        # Substring checks are much cheaper than a regex scan, and almost all
+        # messages need no escaping at all
+        if char in text:
+            text = text.replace(char, escaped)
+    return text
+
+
+class PromptTemplate:
+    """
+    A prompt compiled once into the static text around its message slot.
+
+    Rendering is a plain concatenation of the precomputed prefix, the escaped
+    message and the precomputed suffix, so the large static part of the prompt
+    is never reformatted per request.
+    """
+
+    def __init__(self, template_id: str, version: int, text: str):
+        if text.count(MESSAGE_SLOT) > 1:
+            raise ValueError(f"Prompt template '{template_id}' has more than one {MESSAGE_SLOT} slot")
+
+        self.template_id = template_id
+        self.version = version
+        self.text = text
+        self.content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        # Identifies exactly which prompt produced an output, e.g. "emoji@1#3f2a9c01b7de"
+        self.key = f"{template_id}@{version}#{self.content_hash}"
+
+        self._prefix, slot, self._suffix = text.partition(MESSAGE_SLOT)
+        self.has_message_slot = bool(slot)
+
+    def render(self, message: Optional[str] = None) -> str:
+        """Render the prompt, escaping the user message into the message slot."""
+        if not self.has_message_slot:
+            return self.text
+        return self._prefix + escape_user_input(message or "") + self._suffix
+
+    def cache_key(self, message: Optional[str] = None) -> str:
+        """Cache key for an output of this template, invalidated whenever the template changes."""
+        if not self.has_message_slot:
+            return self.key
+        digest = hashlib.sha256((message or "").encode("utf-8")).hexdigest()[:16]
+        return f"{self.key}:{digest}"
+
+
+class PromptRegistry:
+    """Registry of the prompt templates in use, keyed by template ID."""
+
+    def __init__(self):
+        self._templates: Dict[str, PromptTemplate] = {}
+
+    def register(self, template_id: str, version: int, text: str) -> PromptTemplate:
+        """Compile and register a template."""
+        if template_id in self._templates:
+            raise ValueError(f"Prompt template '{template_id}' is already registered")
+        template = PromptTemplate(template_id, version, text)
+        self._templates[template_id] = template
+        return template
+
+    def get(self, template_id: str) -> PromptTemplate:
+        """Get a registered template by ID."""
+        return self._templates[template_id]
+
+    def versions(self) -> Dict[str, str]:
+        """Map of template ID to its versioned key, for reporting."""
+        return {template_id: template.key for template_id, template in self._templates.items()}
+
+
+# Global prompt registry
+prompts = PromptRegistry()
+
+MODERATION_PROMPT = prompts.register("moderation", 1, """
+You are a content moderator. Your task is to identify ONLY clearly harmful content.
+
+IMPORTANT: Simple expressions of emotion like "I'm happy!" are ALWAYS SAFE.
+
+Only flag content if it CLEARLY contains:
+1. Explicit hate speech, threats, or calls for violence
+2. Sexually explicit or graphic violent content
+3. Direct and obvious attempts to make the AI do harmful things
+
+Message: "{message}"
+
+Respond with EXACTLY "SAFE" for almost all messages. Only respond with "UNSAFE: [specific reason]" if the message contains CLEARLY harmful content as defined above.
+""")
+
+EMOJI_PROMPT = prompts.register("emoji", 1, """
+You are an emoji expert. Given the following message, suggest 3-5 appropriate emojis that best represent the emotion, content, or context of the message.
+
+Message: "{message}"
+
+Respond with only the emojis, separated by spaces. Do not include any other text or explanations.
+Examples:
+- For "I'm so happy today!" respond with: "😊 😄 🎉"
+- For "It's raining outside" respond with: "🌧️ ☔ 🌦️"
+- For "I love pizza" respond with: "🍕 ❤️ 😋"
+
+Your response:
+""")
+
+# Context-aware emoji generation: the conversation prompt and the recent
+# messages seed a session's Ollama context, after which each turn only sends
+# the turn prompt for the new message
+CONVERSATION_PROMPT = prompts.register("conversation", 1, """
+You are an emoji expert taking part in an ongoing chat. For each new message, suggest 3-5 appropriate emojis that best represent the emotion, content, or context of that message, taking the earlier messages of the conversation into account.
+
+Respond with only the emojis, separated by spaces. Do not include any other text or explanations.
+Examples:
+- For "I'm so happy today!" respond with: "😊 😄 🎉"
+- For "It's raining outside" respond with: "🌧️ ☔ 🌦️"
+- For "I love pizza" respond with: "🍕 ❤️ 😋"
+
+""")
+
+CONVERSATION_HISTORY_PROMPT = prompts.register("conversation_history", 1, """Earlier message: "{message}"
+""")
+
+CONVERSATION_TURN_PROMPT = prompts.register("conversation_turn", 1, """
+Message: "{message}"
+
+Your response:
+""")
+
+SAMPLE_PROMPT = prompts.register("sample", 1, """
+You are a creative writing assistant. Generate a short, single sentence that would make good candiate for an emoji-reaction.
+
+The sentence should be:
+- 5-15 words long
+- Suitable for all ages
+- Not too specific to any particular situation
+
+Examples of good inspirational sentences:
+- "Today feels like a day full of possibilities!"
+- "I'm grateful for the little moments that make me smile."
+- "There's something magical about discovering new things."
+- "I love how music can change my entire mood."
+- "Sometimes the best adventures happen close to home."
+
+Generate ONE inspirational sentence following these guidelines. Respond with only the sentence, no quotes or additional text.
+""")
@@ -0,0 +1,177 @@
+"""Request tracing on the OpenTelemetry SDK, with W3C trace-context propagation."""
+
+import functools
+import logging
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from opentelemetry import context as otel_context, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor, SpanExporter
+)
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_propagator = TraceContextTextMapPropagator()
+
+
+class Span:
+    """
+    An OpenTelemetry span with the conveniences the app relies on: attributes
+    set to None are skipped, and the span renders as a traceparent header.
+    """
+
+    def __init__(self, span: trace.Span):
+        self._span = span
+
+    @property
+    def name(self) -> str:
+        return self._span.name
+
+    @name.setter
+    def name(self, name: str):
+        self._span.update_name(name)
+
+    @property
+    def trace_id(self) -> str:
+        return trace.format_trace_id(self._span.get_span_context().trace_id)
+
+    @property
+    def traceparent(self) -> str:
+        """W3C traceparent header value for propagating this span as parent."""
+        carrier: Dict[str, str] = {}
+        _propagator.inject(carrier, context=trace.set_span_in_context(self._span))
+        return carrier["traceparent"]
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self._span.set_attribute(key, value)
+
+    def set_status(self, status: str, description: Optional[str] = None):
+        self._span.set_status(Status(StatusCode[status], description))
+
+
+def current_span() -> Optional[Span]:
+    """The span active in the current context, if any."""
+    span = trace.get_current_span()
+    return Span(span) if span.get_span_context().is_valid else None
+
+
+class Tracer:
+    """
+    Creates spans and tracks the active one per request.
+
+    Spans are always created, so every log line can carry the trace ID, but
+    they are only exported when the provider has an exporter.
+    """
+
+    def __init__(self, provider: TracerProvider):
+        self.provider = provider
+        self._tracer = provider.get_tracer(__name__)
+
+    @contextmanager
+    def start_span(self, name: str, kind: str = "INTERNAL", attributes: Optional[Dict[str, Any]] = None,
+                   traceparent: Optional[str] = None, activate: bool = True) -> Iterator[Span]:
+        """
+        Start a span as a child of the active span, or of `traceparent` if given.
+
+        With `activate=False` the span does not become the active span, which
+        is needed around `yield` in async generators.
+        """
+        parent = _propagator.extract({"traceparent": traceparent}) if traceparent else None
+        otel_span = self._tracer.start_span(
+            name, context=parent, kind=SpanKind[kind],
+            attributes={key: value for key, value in (attributes or {}).items() if value is not None},
+        )
+        span = Span(otel_span)
+        token = otel_context.attach(trace.set_span_in_context(otel_span)) if activate else None
+        try:
+            yield span
+        except (GeneratorExit, KeyboardInterrupt, SystemExit):
+            raise
+        except BaseException as e:
+            if isinstance(e, Exception):
+                span.set_status("ERROR", f"{type(e).__name__}: {e}")
+            else:
+                # Cancellation is not a failure of the operation itself
+                span.set_attribute("cancelled", True)
+            raise
+        finally:
+            otel_span.end()
+            if token is not None:
+                otel_context.detach(token)
+
+    def shutdown(self):
+        """Flush and close the exporter."""
+        self.provider.shutdown()
+
+
+class TraceContextFilter(logging.Filter):
+    """Adds the active trace ID to log records as `trace_id`, so log lines can be matched to traces."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = current_span()
+        record.trace_id = span.trace_id if span else "-"
+        return True
+
+
+def traced(name: str):
+    """Decorator that runs an async function inside a span of the global tracer."""
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            with tracer.start_span(name):
+                return await function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _one_line(span) -> str:
+    return span.to_json(indent=None) + os.linesep
+
+
+def create_exporter(exporter_name: str, file_path: str) -> Optional[SpanExporter]:
+    """The exporter named by the settings: 'none', 'console', 'file' or 'otlp'."""
+    exporter_name = exporter_name.lower()
+    if exporter_name == "console":
+        return ConsoleSpanExporter(formatter=_one_line)
+    if exporter_name == "file":
+        return ConsoleSpanExporter(out=open(file_path, "a", encoding="utf-8"), formatter=_one_line)
+    if exporter_name == "otlp":
+        # Imported here so the protobuf dependency only loads when exporting over OTLP
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        # The endpoint and headers come from the standard OTEL_EXPORTER_OTLP_* variables
+        return OTLPSpanExporter()
+    if exporter_name not in ("", "none"):
+        logger.warning(f"Unknown tracing exporter '{exporter_name}', spans will not be exported")
+    return None
+
+
+def create_tracer(exporter_name: str, file_path: str, service_name: str,
+                  exporter: Optional[SpanExporter] = None) -> Tracer:
+    """
+    Create a tracer exporting to `exporter`, or else to the exporter named by
+    the settings. OTLP exports are batched in the background; the local
+    exporters write each span as it ends.
+    """
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    if exporter is None:
+        exporter = create_exporter(exporter_name, file_path)
+    if exporter is not None:
+        batched = exporter_name.lower() == "otlp"
+        provider.add_span_processor(BatchSpanProcessor(exporter) if batched else SimpleSpanProcessor(exporter))
+    return Tracer(provider)
+
+
+# Global tracer instance
+tracer = create_tracer(settings.tracing_exporter, settings.tracing_file, settings.tracing_service_name)
+# Also the global provider, so OpenTelemetry instrumentation in libraries reports into the same traces
+trace.set_tracer_provider(tracer.provider)
@@ -0,0 +1,190 @@
+"""Pluggable transports for the Ollama client: passthrough, record and replay."""
+
+import asyncio
+import hashlib
+import itertools
+import logging
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import orjson
+from ollama import GenerateResponse, ListResponse
+
+logger = logging.getLogger(__name__)
+
+# Model, prompt, context hash and whether the response was streamed
+RequestKey = Tuple[str, str, str, bool]
+
+
+class ReplayMissError(LookupError):
+    """Raised when a replayed request has no recorded response."""
+
+
+def _context_hash(context: Optional[Sequence[int]]) -> str:
+    if not context:
+        return ""
+    return hashlib.sha1(orjson.dumps(list(context))).hexdigest()
+
+
+def _request_key(request: Dict[str, Any]) -> RequestKey:
+    return (request["model"], request["prompt"] or "", request["context_hash"], request["stream"])
+
+
+def _fields(response: Any) -> Dict[str, Any]:
+    """Ollama response or chunk as a plain dict, without unset fields."""
+    if hasattr(response, "model_dump"):
+        return response.model_dump(exclude_none=True)
+    return {key: value for key, value in dict(response).items() if value is not None}
+
+
+class PassthroughTransport:
+    """Sends requests straight to the Ollama server."""
+
+    def wrap(self, client):
+        return client
+
+    def close(self):
+        pass
+
+
+class RecordingTransport:
+    """
+    Sends requests to the Ollama server and appends each request and its
+    response, with Ollama's timing fields and the latency seen by the
+    client, to a JSONL file that `ReplayTransport` can serve from.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "ab", buffering=0)
+        logger.info(f"Recording LLM requests to {path}")
+
+    def wrap(self, client):
+        return _RecordingClient(client, self)
+
+    def write(self, record: Dict[str, Any]):
+        if not self._file.closed:
+            self._file.write(orjson.dumps(record) + b"\n")
+
+    def close(self):
+        self._file.close()
+
+
+class _RecordingClient:
+    """Ollama client that records what passes through it."""
+
+    def __init__(self, client, transport: RecordingTransport):
+        self._client = client
+        self._transport = transport
+
+    async def generate(self, model: str = "", prompt: Optional[str] = None, *,
+                       context: Optional[Sequence[int]] = None, stream: bool = False, **kwargs):
+        request = {
+            "model": model,
+            "prompt": prompt,
+            "context_hash": _context_hash(context),
+            "stream": stream,
+            "options": dict(kwargs.get("options") or {}),
+        }
+        start = time.perf_counter()
+        response = await self._client.generate(model=model, prompt=prompt, context=context, stream=stream, **kwargs)
+        if stream:
+            return self._record_stream(request, response, start)
+
+        self._transport.write({
+            "request": request,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+            "response": _fields(response),
+        })
+        return response
+
+    async def _record_stream(self, request: Dict[str, Any], stream: AsyncIterator,
+                             start: float) -> AsyncIterator:
+        chunks: List[Dict[str, Any]] = []
+        try:
+            async for chunk in stream:
+                chunks.append({"offset_ms": round((time.perf_counter() - start) * 1000, 3), **_fields(chunk)})
+                yield chunk
+        finally:
+            # Also reached when the consumer stops early, the recording then ends there too
+            self._transport.write({
+                "request": request,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+                "chunks": chunks,
+            })
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class ReplayTransport:
+    """
+    Answers requests from a recording made by `RecordingTransport`, without an Ollama server.
+
+    Requests are matched on model, prompt and context. Generation options
+    such as the temperature are not compared. When a request was recorded
+    several times, its responses are served in turn. Each response is
+    delayed by the latency recorded for it times `time_scale`, so 1 replays
+    the original timings and 0 answers immediately.
+    """
+
+    def __init__(self, path: str, time_scale: float = 1.0):
+        self.path = path
+        self.time_scale = time_scale
+        records: Dict[RequestKey, List[Dict[str, Any]]] = defaultdict(list)
+        with open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    record = orjson.loads(line)
+                    records[_request_key(record["request"])].append(record)
+        self._models = sorted({key[0] for key in records})
+        self._records: Dict[RequestKey, Iterator[Dict[str, Any]]] = {
+            key: itertools.cycle(entries) for key, entries in records.items()
+        }
+        logger.info(f"Replaying {sum(len(entries) for entries in records.values())} LLM responses from {path}")
+
+    def wrap(self, client):
+        return self
+
+    def close(self):
+        pass
+
+    async def list(self) -> ListResponse:
+        """The models that appear in the recording."""
+        return ListResponse(models=[ListResponse.Model(model=model) for model in self._models])
+
+    async def generate(self, model: str = "", prompt: Optional[str] = None, *,
+                       context: Optional[Sequence[int]] = None, stream: bool = False, **kwargs):
+        key = (model, prompt or "", _context_hash(context), stream)
+        entries = self._records.get(key)
+        if entries is None:
+            raise ReplayMissError(f"No recorded response for this {'streamed ' if stream else ''}"
+                                  f"request to model {model}")
+        record = next(entries)
+
+        if stream:
+            return self._replay_stream(record["chunks"])
+        await asyncio.sleep(record["elapsed_ms"] / 1000 * self.time_scale)
+        return GenerateResponse(**record["response"])
+
+    async def _replay_stream(self, chunks: List[Dict[str, Any]]) -> AsyncIterator[GenerateResponse]:
+        start = time.perf_counter()
+        for chunk in chunks:
+            fields = dict(chunk)
+            delay = fields.pop("offset_ms") / 1000 * self.time_scale - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield GenerateResponse(**fields)
+
+
+def create_transport(mode: str, path: str, time_scale: float):
+    """Create the transport named by the settings ('passthrough', 'record' or 'replay')."""
+    mode = mode.lower()
+    if mode == "record":
+        return RecordingTransport(path)
+    if mode == "replay":
+        return ReplayTransport(path, time_scale)
+    if mode not in ("", "passthrough"):
+        logger.warning(f"Unknown LLM transport '{mode}', sending requests to the LLM server")
+    return PassthroughTransport()
@@ -0,0 +1,196 @@
+"""Accounting of the tokens and time of every LLM call, by endpoint, model and client."""
+
+import contextvars
+import logging
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from config import settings
+from metrics import metrics
+from models import ModelLoad, UsageGroup, UsageResponse, UsageStats
+
+logger = logging.getLogger(__name__)
+
+llm_calls_total = metrics.counter(
+    "llm_calls_total",
+    "LLM calls that returned usage data, by API endpoint and model",
+    ["endpoint", "model"]
+)
+llm_tokens_total = metrics.counter(
+    "llm_tokens_total",
+    "Tokens processed by the LLM by API endpoint, model and kind ('prompt' or 'output')",
+    ["endpoint", "model", "kind"]
+)
+llm_time_seconds_total = metrics.counter(
+    "llm_time_seconds_total",
+    "Time the LLM server spent on calls by API endpoint, model and phase ('load', 'prompt_eval', 'eval' or 'total')",
+    ["endpoint", "model", "phase"]
+)
+llm_model_loads_total = metrics.counter(
+    "llm_model_loads_total",
+    "LLM calls that had to load the model first, by API endpoint and model",
+    ["endpoint", "model"]
+)
+
+DIMENSIONS = ("endpoint", "model", "client")
+
+# Client that a client ID is counted as once the tracker holds `max_clients` clients
+OTHER_CLIENTS = "other"
+MAX_CLIENT_ID_LENGTH = 64
+
+
+class Caller(NamedTuple):
+    """What LLM calls are made on behalf of."""
+
+    endpoint: str
+    client: str
+
+
+_current_caller: contextvars.ContextVar[Caller] = contextvars.ContextVar(
+    "current_caller", default=Caller(endpoint="internal", client="-")
+)
+
+
+def api_caller(endpoint: str, client_id: Optional[str]) -> Caller:
+    """Caller of an API request, identified by its X-Client-Id header."""
+    return Caller(endpoint=endpoint, client=(client_id or "anonymous")[:MAX_CLIENT_ID_LENGTH])
+
+
+def current_caller() -> Caller:
+    """The caller of the current context, 'internal' outside of API requests."""
+    return _current_caller.get()
+
+
+@contextmanager
+def calls_for(caller: Caller) -> Iterator[Caller]:
+    """Account the LLM calls made in the block to `caller`."""
+    token = _current_caller.set(caller)
+    try:
+        yield caller
+    finally:
+        _current_caller.reset(token)
+
+
+def _seconds(nanoseconds: Any) -> float:
+    return (nanoseconds or 0) / 1e9
+
+
+class Usage:
+    """Running totals of the usage fields of Ollama responses."""
+
+    __slots__ = ("calls", "prompt_tokens", "output_tokens", "total_seconds", "load_seconds",
+                 "prompt_eval_seconds", "eval_seconds", "model_loads")
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.total_seconds = 0.0
+        self.load_seconds = 0.0
+        self.prompt_eval_seconds = 0.0
+        self.eval_seconds = 0.0
+        self.model_loads = 0
+
+    def add(self, other: "Usage"):
+        for field in self.__slots__:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+    def to_stats(self) -> Dict[str, Any]:
+        stats = {field: getattr(self, field) for field in self.__slots__}
+        return {field: round(value, 6) if isinstance(value, float) else value for field, value in stats.items()}
+
+
+class UsageTracker:
+    """
+    Sums the token counts and durations that Ollama reports for every call.
+
+    Calls are accounted to the caller of the current context, see
+    `calls_for`. A call whose load duration exceeds `load_threshold` seconds
+    is flagged as a model load: Ollama had to load the model into memory
+    first, e.g. because it had been unloaded after being idle or to make
+    room for another model. Only the first `max_clients` client IDs are kept
+    apart, later ones are counted as 'other'.
+    """
+
+    def __init__(self, load_threshold: float, max_clients: int, recent_loads: int = 50):
+        self.load_threshold = load_threshold
+        self.max_clients = max_clients
+        self.since = datetime.now(timezone.utc)
+        self._usage: Dict[Tuple[str, str, str], Usage] = {}
+        self._clients: Set[str] = set()
+        self._recent_loads: Deque[ModelLoad] = deque(maxlen=recent_loads)
+
+    def record(self, model: str, response: Any) -> bool:
+        """
+        Account the usage fields of a finished Ollama response, or of the final chunk of a stream.
+
+        Returns:
+            Whether the call had to load the model
+        """
+        endpoint, client = current_caller()
+        if client not in self._clients:
+            if len(self._clients) >= self.max_clients:
+                client = OTHER_CLIENTS
+            else:
+                self._clients.add(client)
+
+        call = Usage()
+        call.calls = 1
+        call.prompt_tokens = response.get('prompt_eval_count') or 0
+        call.output_tokens = response.get('eval_count') or 0
+        call.total_seconds = _seconds(response.get('total_duration'))
+        call.load_seconds = _seconds(response.get('load_duration'))
+        call.prompt_eval_seconds = _seconds(response.get('prompt_eval_duration'))
+        call.eval_seconds = _seconds(response.get('eval_duration'))
+        model_loaded = call.load_seconds > self.load_threshold
+        call.model_loads = int(model_loaded)
+
+        self._usage.setdefault((endpoint, model, client), Usage()).add(call)
+
+        llm_calls_total.inc(endpoint=endpoint, model=model)
+        llm_tokens_total.inc(call.prompt_tokens, endpoint=endpoint, model=model, kind="prompt")
+        llm_tokens_total.inc(call.output_tokens, endpoint=endpoint, model=model, kind="output")
+        for phase in ("load", "prompt_eval", "eval", "total"):
+            llm_time_seconds_total.inc(getattr(call, f"{phase}_seconds"), endpoint=endpoint, model=model,
+                                       phase=phase)
+
+        if model_loaded:
+            logger.warning(f"LLM call for {endpoint} spent {call.load_seconds:.2f}s loading model {model}")
+            llm_model_loads_total.inc(endpoint=endpoint, model=model)
+            self._recent_loads.appendleft(ModelLoad(
+                at=datetime.now(timezone.utc),
+                endpoint=endpoint,
+                model=model,
+                client=client,
+                load_seconds=round(call.load_seconds, 6)
+            ))
+        return model_loaded
+
+    def report(self, group_by: Sequence[str] = DIMENSIONS) -> UsageResponse:
+        """Usage since startup, summed over the dimensions not in `group_by`."""
+        totals = Usage()
+        groups: Dict[Tuple[Optional[str], ...], Usage] = {}
+        for key, usage in self._usage.items():
+            totals.add(usage)
+            group = tuple(value if dimension in group_by else None for dimension, value in zip(DIMENSIONS, key))
+            groups.setdefault(group, Usage()).add(usage)
+
+        ordered: List[UsageGroup] = [
+            UsageGroup(**dict(zip(DIMENSIONS, group)), **usage.to_stats())
+            for group, usage in sorted(groups.items(), key=lambda item: item[1].total_seconds, reverse=True)
+        ]
+        return UsageResponse(
+            since=self.since,
+            totals=UsageStats(**totals.to_stats()),
+            groups=ordered,
+            recent_model_loads=list(self._recent_loads)
+        )
+
+
+# Global usage tracker
+usage_tracker = UsageTracker(
+    load_threshold=settings.usage_model_load_threshold_ms / 1000,
+    max_clients=settings.usage_max_clients
+)
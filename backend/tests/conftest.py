@@ -0,0 +1,186 @@
+"""
+Shared test setup.
+
+The backend modules read their settings at import, so the environment is set
+here before any of them is imported. The LLM is never contacted: the calls the
+tests make are recorded once through `RecordingTransport` from a scripted
+stand-in for Ollama, and the app answers them through `ReplayTransport`.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from typing import AsyncIterator, Iterator, List, Optional, Sequence
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+MODEL = "test-model"
+RECORDING = os.path.join(tempfile.mkdtemp(prefix="emoji-chat-tests-"), "llm_recording.jsonl")
+
+os.environ.update({
+    "LLM_MODEL": MODEL,
+    "MODERATION_MODEL": "",
+    "LLM_TRANSPORT": "replay",
+    "LLM_TRANSPORT_FILE": RECORDING,
+    "LLM_REPLAY_TIME_SCALE": "0",
+    "LLM_HEDGE_ENABLED": "false",
+    "MODERATION_UNAVAILABLE_POLICY": "reject",
+    "READINESS_SERVE_DEGRADED": "true",
+    "TRACING_EXPORTER": "none",
+    "CONFIG_FILE": "",
+    "CONFIG_WATCH_INTERVAL": "0",
+    "ADMIN_TOKEN": "",
+})
+
+from ollama import GenerateResponse  # noqa: E402
+
+from prompts import (  # noqa: E402
+    MODERATION_PROMPT, EMOJI_PROMPT, SAMPLE_PROMPT,
+    CONVERSATION_PROMPT, CONVERSATION_HISTORY_PROMPT, CONVERSATION_TURN_PROMPT
+)
+from transport import RecordingTransport  # noqa: E402
+
+SAFE_MESSAGE = "I love pizza"
+SAFE_EMOJIS = ["🍕", "❤️", "😋"]
+UNSAFE_MESSAGE = "I will hurt you"
+UNSAFE_REASON = "threat of violence"
+SAMPLE = "Every day is a fresh start!"
+# Passes moderation, but the LLM answers without emojis
+WORDY_MESSAGE = "Tell me about your day"
+# Two turns of a conversation, the second continuing from the first one's context
+FIRST_TURN = ("I love pizza", ["🍕", "❤️"], [1, 2, 3])
+SECOND_TURN = ("Now I am sad", ["😢"], [1, 2, 3, 4, 5])
+# Never recorded, so every LLM call for it fails
+UNRECORDED_MESSAGE = "So happy that nobody recorded this!"
+
+
+class ScriptedOllama:
+    """
+    Stands in for Ollama's AsyncClient, answering every call with `reply`.
+
+    Streamed calls yield one chunk per word, and a final chunk that carries
+    the usage fields.
+    """
+
+    def __init__(self, reply: str = "", context: Optional[Sequence[int]] = None):
+        self.reply = reply
+        self.context = context
+        self.calls: List[dict] = []
+
+    async def generate(self, model: str = "", prompt: Optional[str] = None, *,
+                       context: Optional[Sequence[int]] = None, stream: bool = False, **kwargs):
+        self.calls.append({"model": model, "prompt": prompt, "context": context, "stream": stream, **kwargs})
+        usage = {
+            "prompt_eval_count": len((prompt or "").split()),
+            "eval_count": len(self.reply.split()),
+            "total_duration": 2_000_000,
+            "load_duration": 1_000,
+            "prompt_eval_duration": 500_000,
+            "eval_duration": 1_000_000,
+        }
+        if stream:
+            return self._stream(model, usage)
+        return GenerateResponse(model=model, response=self.reply, done=True,
+                                context=list(self.context) if self.context else None, **usage)
+
+    async def _stream(self, model: str, usage: dict) -> AsyncIterator[GenerateResponse]:
+        for word in self.reply.split():
+            yield GenerateResponse(model=model, response=word + " ", done=False)
+        yield GenerateResponse(model=model, response="", done=True, **usage)
+
+
+async def _record(path: str):
+    ollama = ScriptedOllama()
+    transport = RecordingTransport(path)
+    client = transport.wrap(ollama)
+
+    async def call(prompt: str, reply: str, context: Optional[Sequence[int]] = None,
+                   reply_context: Optional[Sequence[int]] = None, stream: bool = False):
+        ollama.reply, ollama.context = reply, reply_context
+        response = await client.generate(model=MODEL, prompt=prompt, context=context, stream=stream)
+        if stream:
+            async for _ in response:
+                pass
+
+    await call(SAMPLE_PROMPT.render(), f'"{SAMPLE}"')
+    # Readiness probe
+    await call("Hi", "Hello")
+
+    await call(MODERATION_PROMPT.render(SAFE_MESSAGE), "SAFE")
+    await call(EMOJI_PROMPT.render(SAFE_MESSAGE), " ".join(SAFE_EMOJIS))
+    await call(EMOJI_PROMPT.render(SAFE_MESSAGE), " ".join(SAFE_EMOJIS), stream=True)
+    await call(MODERATION_PROMPT.render(UNSAFE_MESSAGE), f"UNSAFE: {UNSAFE_REASON}")
+    await call(MODERATION_PROMPT.render(WORDY_MESSAGE), "SAFE")
+    await call(EMOJI_PROMPT.render(WORDY_MESSAGE), "I would rather not pick any emojis")
+
+    first, first_emojis, first_context = FIRST_TURN
+    second, second_emojis, second_context = SECOND_TURN
+    await call(MODERATION_PROMPT.render(second), "SAFE")
+    await call(CONVERSATION_PROMPT.render() + CONVERSATION_TURN_PROMPT.render(first),
+               " ".join(first_emojis), reply_context=first_context)
+    await call(CONVERSATION_TURN_PROMPT.render(second), " ".join(second_emojis),
+               context=first_context, reply_context=second_context)
+    # Re-seeding the context after a degraded turn
+    await call(CONVERSATION_PROMPT.render() + CONVERSATION_HISTORY_PROMPT.render(first)
+               + CONVERSATION_TURN_PROMPT.render(second), " ".join(second_emojis), reply_context=second_context)
+
+    transport.close()
+
+
+asyncio.run(_record(RECORDING))
+
+
+@pytest.fixture
+def scripted_ollama() -> ScriptedOllama:
+    return ScriptedOllama()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The app, started with its lifespan and answering from the recording."""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def use_llm_client():
+    """
+    Make a fresh LLM client current, so circuit breaker and replay state do
+    not carry over between tests. Settings can be overridden by keyword.
+    """
+    import main
+    from config import settings
+    from llm_client import LLMClient, llm_client
+
+    original = llm_client.current_instance()
+    created = []
+
+    def use(**overrides) -> LLMClient:
+        fresh = LLMClient(settings.current_instance().model_copy(update=overrides))
+        fresh.degraded_mode.watch_queue(main.job_queue.oldest_age)
+        llm_client.swap_instance(fresh)
+        created.append(fresh)
+        return fresh
+
+    use()
+    yield use
+    llm_client.swap_instance(original)
+    for fresh in created:
+        asyncio.run(fresh.close())
+
+
+@pytest.fixture
+def session_id(request) -> Iterator[str]:
+    """A conversation session named after the test, discarded afterwards."""
+    from conversation import conversations
+
+    session_id = request.node.name.replace("[", "-").replace("]", "")
+    yield session_id
+    conversations.discard(session_id)
@@ -0,0 +1,157 @@
+"""API tests against a replayed LLM recording, see conftest."""
+
+from config import settings
+from conftest import (
+    SAFE_MESSAGE, SAFE_EMOJIS, UNSAFE_MESSAGE, UNSAFE_REASON, WORDY_MESSAGE, UNRECORDED_MESSAGE, SAMPLE,
+    FIRST_TURN, SECOND_TURN
+)
+from conversation import conversations
+from heuristic_emojis import heuristic_emojis
+from llm_client import moderation_degraded_total
+
+
+def test_generates_emojis(client, use_llm_client):
+    response = client.post("/api/emojis", json={"message": SAFE_MESSAGE})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "emojis": SAFE_EMOJIS,
+        "message": SAFE_MESSAGE,
+        "moderation_passed": True,
+        "degraded": False,
+    }
+
+
+def test_rejects_message_that_fails_moderation(client, use_llm_client):
+    response = client.post("/api/emojis", json={"message": UNSAFE_MESSAGE})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"Message failed content moderation: {UNSAFE_REASON.upper()}"
+
+
+def test_rejects_message_when_moderation_is_unavailable(client, use_llm_client):
+    response = client.post("/api/emojis", json={"message": UNRECORDED_MESSAGE})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+
+def test_serves_unmoderated_message_when_moderation_fails_open(client, use_llm_client):
+    use_llm_client(moderation_unavailable_policy="allow")
+
+    response = client.post("/api/emojis", json={"message": UNRECORDED_MESSAGE})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["moderation_passed"] is None
+    assert body["degraded"] is True
+    assert body["emojis"] == heuristic_emojis.suggest(UNRECORDED_MESSAGE)
+
+
+def test_serves_heuristic_emojis_when_llm_fails(client, use_llm_client):
+    response = client.post("/api/emojis", json={"message": UNRECORDED_MESSAGE, "disable_moderation": True})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["moderation_passed"] is None
+    assert body["degraded"] is True
+    assert body["emojis"] == heuristic_emojis.suggest(UNRECORDED_MESSAGE)
+
+
+def test_serves_heuristic_emojis_when_llm_answer_has_none(client, use_llm_client):
+    response = client.post("/api/emojis", json={"message": WORDY_MESSAGE})
+
+    assert response.status_code == 200
+    assert response.json()["degraded"] is True
+    assert response.json()["emojis"] == heuristic_emojis.suggest(WORDY_MESSAGE)
+
+
+def test_open_circuit_skips_the_llm(client, use_llm_client):
+    llm = use_llm_client(llm_circuit_failure_threshold=1)
+
+    client.post("/api/emojis", json={"message": UNRECORDED_MESSAGE, "disable_moderation": True})
+    assert llm.circuit_breaker.is_open()
+
+    # Recorded, but not even moderation is attempted while the circuit is open
+    response = client.post("/api/emojis", json={"message": SAFE_MESSAGE})
+    assert response.status_code == 503
+    response = client.post("/api/emojis", json={"message": SAFE_MESSAGE, "disable_moderation": True})
+    assert response.json()["degraded"] is True
+
+
+def test_degraded_mode_skips_moderation(client, use_llm_client):
+    for policy, status_code in (("reject", 503), ("allow", 200)):
+        llm = use_llm_client(moderation_unavailable_policy=policy)
+        llm.degraded_mode.watch_queue(lambda: llm.config.degraded_max_queue_wait + 1)
+        skipped = moderation_degraded_total.value(reason="queue_wait")
+
+        # Recorded, but the LLM is not asked while queued jobs wait too long
+        response = client.post("/api/emojis", json={"message": SAFE_MESSAGE})
+
+        assert response.status_code == status_code
+        assert moderation_degraded_total.value(reason="queue_wait") == skipped + 1
+    assert response.json()["moderation_passed"] is None
+    assert response.json()["degraded"] is True
+
+
+def test_validates_messages(client, use_llm_client):
+    assert client.post("/api/emojis", json={"message": "   "}).status_code == 422
+    assert client.post("/api/emojis", json={"message": "x" * (settings.max_message_length + 1)}).status_code == 422
+    assert client.post("/api/emojis", json={"message": "hi", "session_id": "not valid!"}).status_code == 422
+
+
+def test_conversation_continues_from_context(client, use_llm_client, session_id):
+    (first, first_emojis, first_context), (second, second_emojis, second_context) = FIRST_TURN, SECOND_TURN
+
+    response = client.post("/api/emojis", json={"message": first, "session_id": session_id})
+    assert response.json()["emojis"] == first_emojis
+    assert list(conversations.get(session_id).context) == first_context
+
+    response = client.post("/api/emojis", json={"message": second, "session_id": session_id})
+    assert response.json()["emojis"] == second_emojis
+    assert response.json()["degraded"] is False
+    assert list(conversations.get(session_id).context) == second_context
+
+    assert client.delete(f"/api/sessions/{session_id}").status_code == 204
+    assert client.delete(f"/api/sessions/{session_id}").status_code == 404
+
+
+def test_conversation_reseeds_context_after_degraded_turn(client, use_llm_client, session_id):
+    (first, _, _), (second, second_emojis, second_context) = FIRST_TURN, SECOND_TURN
+    llm = use_llm_client(llm_circuit_failure_threshold=1)
+
+    llm.circuit_breaker.record_failure()
+    response = client.post("/api/emojis", json={"message": first, "session_id": session_id,
+                                                "disable_moderation": True})
+    assert response.json()["degraded"] is True
+    assert conversations.get(session_id).context is None
+
+    llm.circuit_breaker.record_success()
+    response = client.post("/api/emojis", json={"message": second, "session_id": session_id})
+    assert response.json() == {"emojis": second_emojis, "message": second, "moderation_passed": True,
+                               "degraded": False}
+    assert list(conversations.get(session_id).context) == second_context
+
+
+def test_conversation_reseeds_context_from_another_server(client, use_llm_client, session_id):
+    (first, _, _), (second, second_emojis, second_context) = FIRST_TURN, SECOND_TURN
+
+    client.post("/api/emojis", json={"message": first, "session_id": session_id})
+    assert conversations.get(session_id).context is not None
+
+    # As after a reload, or for a turn that was still running on the old client
+    use_llm_client(llm_url="http://other-server:11434")
+    response = client.post("/api/emojis", json={"message": second, "session_id": session_id})
+
+    assert response.json()["emojis"] == second_emojis
+    assert list(conversations.get(session_id).context) == second_context
+    assert conversations.get(session_id).context_source == ("http://other-server:11434", settings.llm_model)
+
+
+def test_sample(client, use_llm_client):
+    assert client.get("/api/sample").json() == {"sample": SAMPLE}
+
+
+def test_admin_reload_is_disabled_without_token(client, use_llm_client):
+    response = client.post("/api/admin/reload", headers={"X-Admin-Token": ""})
+    assert response.status_code == 403
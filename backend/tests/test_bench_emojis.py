@@ -0,0 +1,35 @@
+import argparse
+import asyncio
+import json
+
+import pytest
+
+import bench_emojis
+from conftest import FIRST_TURN, SECOND_TURN, RECORDING
+from llm_client import llm_client
+
+
+@pytest.fixture
+def bench_args(tmp_path):
+    corpus = tmp_path / "corpus.jsonl"
+    corpus.write_text("".join(json.dumps({"message": message, "reference": emojis}) + "\n"
+                              for message, emojis, _ in (FIRST_TURN, SECOND_TURN)))
+    original = llm_client.current_instance()
+    yield argparse.Namespace(corpus=str(corpus), replay=RECORDING, record=None, time_scale=0, repeat=1,
+                             concurrency=1, conversation=0, label="")
+    asyncio.run(llm_client.current_instance().close())
+    llm_client.swap_instance(original)
+
+
+def test_conversation_mode_replays_the_corpus_as_turns(bench_args):
+    bench_args.conversation = 2
+
+    results = asyncio.run(bench_emojis.run(bench_args))
+
+    first, second = results["items"]
+    assert (first["session"], first["turn"], first["seeded"]) == (1, 1, True)
+    assert (second["session"], second["turn"], second["seeded"]) == (1, 2, False)
+    assert [first["emojis"], second["emojis"]] == [FIRST_TURN[1], SECOND_TURN[1]]
+    assert results["summary"]["conversation"]["sessions"] == 1
+    assert results["summary"]["conversation"]["seeded_rate"] == 0.5
+    assert results["summary"]["agreement"]["hit_rate"] == 1.0
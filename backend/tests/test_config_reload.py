@@ -0,0 +1,129 @@
+import asyncio
+import os
+
+import pytest
+
+from config import settings
+from config_reload import ConfigReloader
+
+
+@pytest.fixture(autouse=True)
+def restore_settings():
+    original = settings.current_instance()
+    yield
+    settings.swap_instance(original)
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / "backend.env"
+    path.write_text("")
+    return path
+
+
+def test_applies_subscribed_changes(config_file):
+    reloader = ConfigReloader(str(config_file), watch_interval=0)
+    prepared, committed = [], []
+
+    def prepare(config):
+        prepared.append(config.llm_temperature)
+        return lambda: committed.append(settings.llm_temperature)
+
+    reloader.subscribe(["llm_temperature"], prepare)
+    reloader.subscribe(["job_max_wait"])
+    config_file.write_text("LLM_TEMPERATURE=0.25\nJOB_MAX_WAIT=3\nPORT=9999\n")
+
+    response = asyncio.run(reloader.reload("test"))
+
+    assert sorted(response.changed) == ["job_max_wait", "llm_temperature", "port"]
+    assert response.restart_required == ["port"]
+    assert response.version == 2
+    # Committed after the new settings became current
+    assert prepared == [0.25] and committed == [0.25]
+    assert settings.job_max_wait == 3
+
+
+def test_unchanged_settings_keep_the_version(config_file):
+    reloader = ConfigReloader(str(config_file), watch_interval=0)
+    reloader.subscribe(["llm_temperature"], lambda config: pytest.fail("nothing changed"))
+
+    response = asyncio.run(reloader.reload("test"))
+
+    assert response.changed == []
+    assert response.version == 1
+
+
+def test_rejected_reload_changes_nothing(config_file):
+    reloader = ConfigReloader(str(config_file), watch_interval=0)
+    committed = []
+
+    def reject(config):
+        raise ValueError("bad temperature")
+
+    reloader.subscribe(["llm_temperature"], lambda config: lambda: committed.append(config))
+    reloader.subscribe(["llm_temperature"], reject)
+    config_file.write_text("LLM_TEMPERATURE=0.25\n")
+    before = settings.current_instance()
+
+    with pytest.raises(ValueError):
+        asyncio.run(reloader.reload("test"))
+
+    assert settings.current_instance() is before
+    assert committed == []
+    assert reloader.version == 1
+
+
+def test_invalid_values_are_rejected(config_file):
+    reloader = ConfigReloader(str(config_file), watch_interval=0)
+    config_file.write_text("LLM_TEMPERATURE=warm\n")
+    before = settings.current_instance()
+
+    with pytest.raises(Exception):
+        asyncio.run(reloader.reload("test"))
+    assert settings.current_instance() is before
+
+
+def test_missing_config_file_is_an_error(tmp_path):
+    reloader = ConfigReloader(str(tmp_path / "missing.env"), watch_interval=0)
+
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(reloader.reload("test"))
+
+
+def test_watches_config_file(config_file):
+    async def scenario():
+        reloader = ConfigReloader(str(config_file), watch_interval=0.01)
+        reloader.subscribe(["job_max_wait"])
+        reloader.start()
+        config_file.write_text("JOB_MAX_WAIT=7\n")
+        stat = os.stat(config_file)
+        os.utime(config_file, (stat.st_atime, stat.st_mtime + 10))
+        for _ in range(200):
+            if reloader.version > 1:
+                break
+            await asyncio.sleep(0.01)
+        await reloader.stop()
+        return reloader.version
+
+    assert asyncio.run(scenario()) == 2
+    assert settings.job_max_wait == 7
+
+
+def test_model_change_drops_conversation_contexts(config_file):
+    import main
+    from conversation import conversations
+
+    conversation = conversations.get("reload-test")
+    conversation.record("I love pizza", ["🍕"], [1, 2, 3], source=("http://localhost:11434", settings.llm_model))
+    reloader = ConfigReloader(str(config_file), watch_interval=0)
+    reloader.subscribe(["llm_url", "llm_model"], main.reset_conversation_contexts)
+
+    config_file.write_text("LLM_TEMPERATURE=0.25\n")
+    asyncio.run(reloader.reload("test"))
+    assert conversation.context is not None
+
+    config_file.write_text("LLM_MODEL=other-model\n")
+    asyncio.run(reloader.reload("test"))
+    assert conversation.context is None
+    assert len(conversation.messages) == 1
+    conversations.discard("reload-test")
@@ -0,0 +1,91 @@
+import pytest
+
+import conversation as conversation_module
+from conversation import Conversation, ConversationStore
+
+
+def test_context_is_dropped_over_token_cap():
+    conversation = Conversation("s", max_messages=10, max_context_tokens=4, max_bytes=10_000)
+
+    conversation.record("hello", ["👋"], [1, 2, 3, 4])
+    assert list(conversation.context) == [1, 2, 3, 4]
+
+    conversation.record("again", ["👋"], [1, 2, 3, 4, 5])
+    assert conversation.context is None
+    assert conversation.turns == 2
+    assert len(conversation.messages) == 2
+
+
+def test_memory_cap_drops_context_then_oldest_messages():
+    conversation = Conversation("s", max_messages=10, max_context_tokens=1000, max_bytes=40)
+
+    conversation.record("a" * 15, [], [1, 2, 3])
+    assert conversation.context is not None
+
+    conversation.record("b" * 15, [], [1, 2, 3])
+    assert conversation.context is None
+    assert len(conversation.messages) == 2
+
+    conversation.record("c" * 50, [], None)
+    # The latest message is kept even when it alone is over the cap
+    assert [message for message, _ in conversation.messages] == ["c" * 50]
+
+
+def test_keeps_only_recent_messages():
+    conversation = Conversation("s", max_messages=2, max_context_tokens=1000, max_bytes=10_000)
+    for message in ("one", "two", "three"):
+        conversation.record(message, ["👍"], None)
+
+    assert [message for message, _ in conversation.messages] == ["two", "three"]
+
+
+def store(**limits) -> ConversationStore:
+    options = dict(max_sessions=10, max_messages=10, max_context_tokens=1000, max_bytes=10_000, idle_timeout=60)
+    options.update(limits)
+    return ConversationStore(**options)
+
+
+def test_evicts_least_recently_used_session_at_capacity():
+    conversations = store(max_sessions=2)
+    first = conversations.get("first")
+    conversations.get("second")
+    assert conversations.get("first") is first
+
+    conversations.get("third")
+
+    assert conversations.discard("second") is False
+    assert conversations.discard("first") is True
+    assert conversations.discard("third") is True
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(conversation_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_evicts_idle_sessions(clock):
+    conversations = store(idle_timeout=60)
+    conversations.get("idle").record("hello", ["👋"], [1, 2])
+    clock[0] += 30
+    conversations.get("active")
+
+    clock[0] += 31
+    stats = conversations.stats()
+
+    assert stats.sessions == 1
+    assert conversations.discard("idle") is False
+
+
+def test_stats_report_memory():
+    conversations = store(max_bytes=500)
+    conversations.get("a").record("hello", ["👋"], [1, 2])
+    conversations.get("b").record("hi", [], None)
+
+    stats = conversations.stats()
+
+    assert stats.sessions == 2
+    assert stats.memory_bytes == conversations.memory_bytes()
+    assert stats.max_session_memory_bytes == conversations.get("a").memory_bytes()
+    assert stats.session_memory_cap_bytes == 500
@@ -0,0 +1,136 @@
+import pytest
+
+import degraded_mode
+from degraded_mode import CircuitBreaker, DegradedMode
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(degraded_mode.time, "monotonic", clock)
+    return clock
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.is_open()
+    assert not breaker.allow()
+
+
+def test_circuit_lets_one_trial_through_after_reset_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+
+    clock.now += 30
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.allow()
+    assert breaker.allow()
+
+
+def test_failed_trial_keeps_circuit_open(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+
+    breaker.record_failure()
+    clock.now += 29
+    assert not breaker.allow()
+
+
+def test_trial_that_never_reports_back_is_replaced(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+
+    clock.now += 30
+    assert breaker.allow()
+
+
+def degraded(breaker=None, **limits) -> DegradedMode:
+    options = dict(max_queue_wait=0, latency_slo=0, latency_percentile=95, probe_fraction=0, min_samples=3)
+    options.update(limits)
+    return DegradedMode(breaker or CircuitBreaker(failure_threshold=1, reset_timeout=30), **options)
+
+
+def test_degraded_while_circuit_is_open(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    mode = degraded(breaker)
+    assert mode.reason() is None
+
+    breaker.record_failure()
+    assert mode.reason() == "circuit_open"
+
+
+def test_degraded_while_queue_wait_is_too_long(clock):
+    wait = 0.0
+    mode = degraded(max_queue_wait=10)
+    mode.watch_queue(lambda: wait)
+    assert mode.reason() is None
+
+    wait = 11.0
+    assert mode.reason() == "queue_wait"
+
+
+def test_degraded_while_latency_slo_is_breached_with_probes(clock):
+    mode = degraded(latency_slo=0.5, probe_fraction=0.5)
+    mode.observe(1.0)
+    mode.observe(1.0)
+    # Too few samples to judge
+    assert mode.reason() is None
+
+    mode.observe(1.0)
+    assert [mode.reason() for _ in range(4)] == ["latency_slo", None, "latency_slo", None]
+
+    for _ in range(100):
+        mode.observe(0.1)
+    assert mode.reason() is None
+
+
+def test_zero_limits_disable_checks(clock):
+    mode = degraded()
+    mode.watch_queue(lambda: 1e6)
+    for _ in range(10):
+        mode.observe(1e6)
+
+    assert mode.reason() is None
+
+
+def test_latency_slo_breach_ends_once_slow_latencies_age_out(clock):
+    mode = degraded(latency_slo=0.5, window_seconds=60)
+    for _ in range(3):
+        mode.observe(1.0)
+    assert mode.reason() == "latency_slo"
+
+    clock.now += 61
+    assert mode.reason() is None
+
+
+def test_moderation_check_leaves_probes_to_emoji_generation(clock):
+    mode = degraded(latency_slo=0.5, probe_fraction=0.5)
+    for _ in range(3):
+        mode.observe(1.0)
+
+    assert [mode.reason(probe=False) for _ in range(4)] == ["latency_slo"] * 4
+    assert [mode.reason() for _ in range(2)] == ["latency_slo", None]
@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+import pytest
+
+from config import Current, settings
+from health import ReadinessProber
+from llm_client import LLMClient
+
+
+def probe(serve_degraded: bool = False, **overrides):
+    async def scenario():
+        llm = LLMClient(settings.current_instance().model_copy(update=overrides))
+        prober = ReadinessProber(Current(llm), interval=60, timeout=5, max_staleness=60,
+                                 serve_degraded=serve_degraded)
+        try:
+            return await prober.probe()
+        finally:
+            await llm.close()
+
+    return asyncio.run(scenario())
+
+
+def test_ready_when_model_is_available_and_generates():
+    result = probe()
+
+    assert (result.status, result.ready) == ("ready", True)
+    assert result.model_available is True
+    assert result.generation_ok is True
+
+
+def test_not_ready_when_model_is_missing():
+    result = probe(llm_model="missing-model")
+
+    assert (result.status, result.ready) == ("not_ready", False)
+    assert result.model_available is False
+    assert "missing-model" in result.detail
+
+
+@pytest.mark.parametrize("overrides", [{"llm_model": "missing-model"}, {"moderation_model": "missing-model"}])
+def test_degraded_but_ready_when_serving_degraded(overrides):
+    result = probe(serve_degraded=True, moderation_unavailable_policy="allow", **overrides)
+
+    assert (result.status, result.ready) == ("degraded", True)
+    assert "missing-model" in result.detail
+
+
+def test_not_ready_when_moderation_would_reject_everything():
+    result = probe(serve_degraded=True, moderation_unavailable_policy="reject", llm_model="missing-model")
+
+    assert (result.status, result.ready) == ("not_ready", False)
+
+
+def test_stale_result_is_not_ready():
+    prober = ReadinessProber(llm_client=None, interval=60, timeout=5, max_staleness=0, serve_degraded=True)
+    assert prober.status().status == "starting"
+
+    prober._checked_at = 0.0
+    assert (prober.status().status, prober.status().ready) == ("stale", False)
+
+
+def test_health_endpoints(client, use_llm_client):
+    assert client.get("/health").json()["llm_model"] == settings.llm_model
+    assert client.get("/health/live").json() == {"status": "alive"}
+
+    # The first probe runs in the background at startup
+    deadline = time.monotonic() + 5
+    while (response := client.get("/health/ready")).json()["status"] == "starting" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
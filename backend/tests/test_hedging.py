@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from hedging import HedgePolicy, LatencyWindow
+
+
+def test_latency_window_nearest_rank_percentile():
+    window = LatencyWindow(size=4)
+    for latency in (5, 1, 4, 2, 3):
+        window.add(latency)
+
+    assert len(window) == 4
+    assert window.percentile(50) == 2
+    assert window.percentile(75) == 3
+    assert window.percentile(100) == 4
+    assert window.percentile(0) == 1
+
+
+def primed(budget: float = 1.0, min_delay: float = 0.02) -> HedgePolicy:
+    policy = HedgePolicy(percentile=95, budget=budget, min_delay=min_delay, min_samples=3)
+    for _ in range(3):
+        policy._record("emoji", 0.001)
+    return policy
+
+
+def attempts(*delays: float, results=None, started=None):
+    async def attempt(index: int):
+        if started is not None:
+            started.append(index)
+        await asyncio.sleep(delays[index])
+        return (results or ["primary", "hedge"])[index]
+    return attempt
+
+
+def test_no_hedge_until_enough_latency_data():
+    policy = HedgePolicy(percentile=95, budget=1.0, min_delay=0.0, min_samples=3)
+    assert policy.hedge_delay("emoji") is None
+
+    started = []
+    result = asyncio.run(policy.run("emoji", attempts(0.01, 0, started=started), is_valid=bool))
+
+    assert result == "primary"
+    assert started == [0]
+    assert len(policy._windows["emoji"]) == 1
+
+
+def test_hedge_delay_is_at_least_min_delay():
+    assert primed(min_delay=0.02).hedge_delay("emoji") == 0.02
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    policy = primed()
+    cancelled = []
+
+    async def attempt(index: int):
+        try:
+            await asyncio.sleep(1.0 if index == 0 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(index)
+            raise
+        return ["primary", "hedge"][index]
+
+    assert asyncio.run(policy.run("emoji", attempt, is_valid=bool)) == "hedge"
+    assert cancelled == [0]
+    # Recorded from the start of the primary, including the hedge delay
+    assert policy._windows["emoji"].percentile(100) >= 0.03
+
+
+def test_hedges_stay_within_budget():
+    policy = primed(budget=0.0)
+    started = []
+
+    result = asyncio.run(policy.run("emoji", attempts(0.05, 0, started=started), is_valid=bool))
+
+    assert result == "primary"
+    assert started == [0]
+
+
+def test_invalid_result_waits_for_the_other_attempt():
+    policy = primed()
+
+    result = asyncio.run(policy.run("emoji", attempts(0.05, 0.1, results=["", "hedge"]), is_valid=bool))
+
+    assert result == "hedge"
+
+
+def test_reraises_when_every_attempt_fails():
+    policy = primed()
+
+    async def attempt(index: int):
+        await asyncio.sleep(0.05 if index == 0 else 0)
+        raise RuntimeError(f"attempt {index} failed")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(policy.run("emoji", attempt, is_valid=bool))
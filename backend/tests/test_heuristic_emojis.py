@@ -0,0 +1,55 @@
+from heuristic_emojis import AhoCorasick, DEFAULT_EMOJIS, HeuristicEmojiEngine, LEXICON, Match, heuristic_emojis
+
+
+def test_aho_corasick_finds_overlapping_terms():
+    matcher = AhoCorasick(["he", "she", "his", "hers"])
+
+    assert sorted(matcher.find("ushers")) == [Match(1, 4, "she"), Match(2, 4, "he"), Match(2, 6, "hers")]
+    assert matcher.find("xyz") == []
+
+
+def test_aho_corasick_follows_failure_links():
+    matcher = AhoCorasick(["abcd", "bc"])
+
+    assert matcher.find("abce") == [Match(1, 3, "bc")]
+
+
+def test_matches_whole_words_with_common_endings():
+    assert heuristic_emojis.suggest("laughing")[0] == "😂"
+    assert heuristic_emojis.suggest("unhappy") == DEFAULT_EMOJIS
+    assert heuristic_emojis.suggest("qwerty") == DEFAULT_EMOJIS
+
+
+def test_longest_phrase_wins():
+    assert heuristic_emojis.suggest("Happy birthday to you")[:2] == ["🎂", "🎉"]
+
+
+def test_negation_drops_keyword_emojis_and_flips_sentiment():
+    assert heuristic_emojis.suggest("I am not happy") == ["😔"]
+    assert heuristic_emojis.suggest("I don’t hate it")[0] != "😡"
+
+
+def test_intensifier_and_exclamation_raise_sentiment():
+    engine = HeuristicEmojiEngine({"good": (("👍",), 0.5)})
+
+    assert engine.suggest("good") == ["👍", "😊"]
+    assert engine.suggest("so good!") == ["👍", "😊"]
+    assert engine.suggest("so good good!") == ["👍", "😄", "🎉"]
+
+
+def test_limits_and_deduplicates_emojis():
+    emojis = heuristic_emojis.suggest("I love love pizza with friends, happy happy joy!", limit=3)
+
+    assert len(emojis) == 3
+    assert len(set(emojis)) == 3
+
+
+def test_lexicon_terms_are_lowercase():
+    assert all(term == term.lower() for term in LEXICON)
+
+
+def test_short_keywords_only_match_themselves_and_listed_forms():
+    for word in ("his", "wind", "fund", "card", "caring"):
+        assert heuristic_emojis.suggest(word) == DEFAULT_EMOJIS, word
+    assert heuristic_emojis.suggest("wins")[0] == "🏆"
+    assert heuristic_emojis.suggest("hi")[0] == "👋"
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from conftest import SAFE_MESSAGE, SAFE_EMOJIS, UNSAFE_MESSAGE, UNSAFE_REASON
+from jobs import JobQueue, QueueFullError
+from models import JobRequest
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_jobs_run_in_priority_then_submission_order():
+    processed = []
+
+    async def processor(request: JobRequest):
+        processed.append(request.message)
+        return {"emojis": ["👍"], "message": request.message, "moderation_passed": None, "degraded": False}
+
+    async def scenario():
+        queue = JobQueue(processor, workers=1, max_size=10, result_ttl=60)
+        jobs = [queue.submit(JobRequest(message=message, priority=priority))
+                for message, priority in (("later", 5), ("first", 1), ("last", 9), ("second", 1))]
+        queue.start()
+        for job in jobs:
+            await queue.wait(job, 5)
+        await queue.stop()
+        return jobs
+
+    jobs = run(scenario())
+
+    assert processed == ["first", "second", "later", "last"]
+    assert all(job.status == "succeeded" for job in jobs)
+    assert jobs[0].to_response().result.emojis == ["👍"]
+
+
+def test_failed_jobs_keep_the_status_code():
+    async def processor(request: JobRequest):
+        if request.message == "rejected":
+            raise HTTPException(status_code=400, detail="Message failed content moderation")
+        raise RuntimeError("boom")
+
+    async def scenario():
+        queue = JobQueue(processor, workers=2, max_size=10, result_ttl=60)
+        queue.start()
+        rejected = queue.submit(JobRequest(message="rejected"))
+        crashed = queue.submit(JobRequest(message="crashed"))
+        await queue.wait(rejected, 5)
+        await queue.wait(crashed, 5)
+        await queue.stop()
+        return rejected, crashed
+
+    rejected, crashed = run(scenario())
+
+    assert (rejected.status, rejected.status_code, rejected.error) == \
+        ("failed", 400, "Message failed content moderation")
+    assert (crashed.status, crashed.status_code, crashed.error) == ("failed", 500, "Failed to generate emojis")
+
+
+def test_full_queue_rejects_jobs():
+    async def scenario():
+        queue = JobQueue(processor=None, workers=1, max_size=2, result_ttl=60)
+        queue.submit(JobRequest(message="one"))
+        queue.submit(JobRequest(message="two"))
+        with pytest.raises(QueueFullError):
+            queue.submit(JobRequest(message="three"))
+        return queue.stats()
+
+    stats = run(scenario())
+
+    assert stats.queue_depth == 2
+    assert stats.workers_busy == 0
+    assert stats.oldest_job_age_seconds >= 0
+
+
+def test_results_expire_after_ttl():
+    async def processor(request: JobRequest):
+        return {"emojis": [], "message": request.message, "moderation_passed": None, "degraded": False}
+
+    async def scenario():
+        queue = JobQueue(processor, workers=1, max_size=10, result_ttl=0.05)
+        queue.start()
+        job = queue.submit(JobRequest(message="hello"))
+        await queue.wait(job, 5)
+        found = queue.get(job.id)
+        await asyncio.sleep(0.1)
+        expired = queue.get(job.id)
+        await queue.stop()
+        return job, found, expired
+
+    job, found, expired = run(scenario())
+
+    assert found is job
+    assert expired is None
+
+
+def test_wait_returns_unfinished_job_after_timeout():
+    async def scenario():
+        queue = JobQueue(processor=None, workers=1, max_size=10, result_ttl=60)
+        job = queue.submit(JobRequest(message="hello"))
+        await queue.wait(job, 0.01)
+        return job, queue.oldest_age()
+
+    job, oldest_age = run(scenario())
+
+    assert job.status == "queued"
+    assert oldest_age > 0
+
+
+def test_job_endpoints(client, use_llm_client):
+    response = client.post("/api/jobs", json={"message": SAFE_MESSAGE, "priority": 1})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.headers["location"] == f"/api/jobs/{job_id}"
+
+    job = client.get(f"/api/jobs/{job_id}", params={"wait": 5}).json()
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"emojis": SAFE_EMOJIS, "message": SAFE_MESSAGE, "moderation_passed": True,
+                             "degraded": False}
+
+
+def test_job_fails_like_the_synchronous_endpoint(client, use_llm_client):
+    job_id = client.post("/api/jobs", json={"message": UNSAFE_MESSAGE}).json()["job_id"]
+
+    job = client.get(f"/api/jobs/{job_id}", params={"wait": 5}).json()
+    assert job["status"] == "failed"
+    assert job["status_code"] == 400
+    assert UNSAFE_REASON.upper() in job["error"]
+
+
+def test_unknown_job(client, use_llm_client):
+    assert client.get("/api/jobs/unknown").status_code == 404
+    assert client.get("/api/jobs/stats").json()["queue_depth"] == 0
@@ -0,0 +1,45 @@
+"""Response serialization: orjson on hand-built responses, Pydantic on response models."""
+
+import json
+
+import orjson
+from fastapi.routing import APIRoute
+
+import main
+from bench_serialization import fast_response, model_response
+from conftest import SAFE_MESSAGE
+from models import EmojiResponse
+from responses import ORJSONResponse
+
+
+def test_orjson_response_matches_the_response_model():
+    for moderation_passed in (True, False, None):
+        assert json.loads(fast_response("Déjà vu 🍕", moderation_passed)) == \
+            json.loads(model_response("Déjà vu 🍕", moderation_passed))
+
+
+def test_orjson_response_keeps_non_ascii():
+    assert ORJSONResponse({"emoji": "🍕"}).body == orjson.dumps({"emoji": "🍕"})
+
+
+def test_emoji_response_validates_against_its_model(client, use_llm_client):
+    response = client.post("/api/emojis", json={"message": SAFE_MESSAGE})
+
+    assert response.headers["content-type"] == "application/json"
+    assert EmojiResponse.model_validate_json(response.content).message == SAFE_MESSAGE
+
+
+def test_only_hand_built_routes_use_orjson():
+    response_classes = {route.path: route.response_class for route in main.app.routes
+                        if isinstance(route, APIRoute)}
+
+    assert response_classes["/"] is ORJSONResponse
+    assert response_classes["/api/prompts"] is ORJSONResponse
+    # Routes with a response model keep FastAPI's native Pydantic serialization
+    assert response_classes["/health"] is not ORJSONResponse
+    assert response_classes["/api/jobs/{job_id}"] is not ORJSONResponse
+
+
+def test_hand_built_routes(client):
+    assert client.get("/").json()["endpoints"]["generate_emojis"] == "/api/emojis"
+    assert set(client.get("/api/prompts").json()) >= {"moderation", "emoji", "sample"}
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import logging
+
+import pytest
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import SpanKind, StatusCode
+
+from tracing import TraceContextFilter, create_tracer, current_span
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+TRACEPARENT = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+
+@pytest.fixture
+def exported():
+    exporter = InMemorySpanExporter()
+    tracer = create_tracer("none", "", "test-service", exporter=exporter)
+    yield tracer, exporter
+    tracer.shutdown()
+
+
+def test_child_spans_nest_under_the_active_span(exported):
+    tracer, exporter = exported
+
+    with tracer.start_span("parent", kind="SERVER") as parent:
+        with tracer.start_span("child", attributes={"skipped": None}) as child:
+            child.set_attribute("emoji.count", 3)
+            assert current_span().trace_id == parent.trace_id
+    assert current_span() is None
+
+    child, parent = exporter.get_finished_spans()
+    assert child.parent.span_id == parent.context.span_id
+    assert child.context.trace_id == parent.context.trace_id
+    assert dict(child.attributes) == {"emoji.count": 3}
+    assert parent.kind == SpanKind.SERVER
+    assert parent.resource.attributes["service.name"] == "test-service"
+
+
+def test_continues_the_trace_of_a_traceparent(exported):
+    tracer, exporter = exported
+
+    with tracer.start_span("request", traceparent=TRACEPARENT) as span:
+        assert span.traceparent.startswith(f"00-{TRACE_ID}-")
+
+    (span,) = exporter.get_finished_spans()
+    assert span.parent.span_id == 0x00f067aa0ba902b7
+
+
+def test_invalid_traceparent_starts_a_new_trace(exported):
+    tracer, _ = exported
+
+    with tracer.start_span("request", traceparent="00-bogus") as span:
+        assert span.trace_id != TRACE_ID
+
+
+def test_errors_and_cancellation(exported):
+    tracer, exporter = exported
+
+    with pytest.raises(ValueError):
+        with tracer.start_span("failing"):
+            raise ValueError("boom")
+
+    async def cancelled():
+        with tracer.start_span("cancelled"):
+            await asyncio.sleep(1)
+
+    async def scenario():
+        task = asyncio.create_task(cancelled())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+
+    failing, cancelled_span = exporter.get_finished_spans()
+    assert failing.status.status_code == StatusCode.ERROR
+    assert failing.status.description == "ValueError: boom"
+    assert cancelled_span.status.status_code == StatusCode.UNSET
+    assert cancelled_span.attributes["cancelled"] is True
+
+
+def test_inactive_span_is_not_the_active_span(exported):
+    tracer, _ = exported
+
+    with tracer.start_span("stream", activate=False):
+        assert current_span() is None
+
+
+def test_file_exporter_writes_a_span_per_line(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = create_tracer("file", str(path), "test-service")
+    with tracer.start_span("first"):
+        pass
+    with tracer.start_span("second"):
+        pass
+    tracer.shutdown()
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [span["name"] for span in spans] == ["first", "second"]
+    assert spans[0]["resource"]["attributes"]["service.name"] == "test-service"
+
+
+def test_log_records_carry_the_trace_id(exported):
+    tracer, _ = exported
+    record = logging.LogRecord("test", logging.INFO, __file__, 0, "message", None, None)
+
+    TraceContextFilter().filter(record)
+    assert record.trace_id == "-"
+    with tracer.start_span("request", traceparent=TRACEPARENT):
+        TraceContextFilter().filter(record)
+    assert record.trace_id == TRACE_ID
+
+
+def test_responses_continue_the_callers_trace(client, use_llm_client):
+    response = client.get("/health/live", headers={"traceparent": TRACEPARENT})
+
+    assert response.headers["traceparent"].startswith(f"00-{TRACE_ID}-")
+    assert response.headers["traceparent"] != TRACEPARENT
@@ -0,0 +1,125 @@
+import asyncio
+
+import orjson
+import pytest
+
+from transport import (
+    PassthroughTransport, RecordingTransport, ReplayMissError, ReplayTransport, create_transport
+)
+
+
+def record(path, ollama, calls):
+    """Make `calls`, as (reply, generate kwargs) pairs, through a recording transport."""
+    async def scenario():
+        transport = RecordingTransport(str(path))
+        client = transport.wrap(ollama)
+        for reply, kwargs in calls:
+            ollama.reply = reply
+            response = await client.generate(**kwargs)
+            if kwargs.get("stream"):
+                async for _ in response:
+                    pass
+        transport.close()
+
+    asyncio.run(scenario())
+
+
+def replay(path, **kwargs):
+    async def scenario():
+        response = await ReplayTransport(str(path), time_scale=0).generate(**kwargs)
+        if kwargs.get("stream"):
+            return "".join([chunk.response async for chunk in response])
+        return response.response
+
+    return asyncio.run(scenario())
+
+
+def test_replays_what_was_recorded(tmp_path, scripted_ollama):
+    path = tmp_path / "recording.jsonl"
+    record(path, scripted_ollama, [("🍕 😋", {"model": "m", "prompt": "pizza", "options": {"temperature": 0.7}})])
+
+    assert replay(path, model="m", prompt="pizza") == "🍕 😋"
+    # Generation options are not part of the key
+    assert replay(path, model="m", prompt="pizza", options={"temperature": 0.1}) == "🍕 😋"
+    assert scripted_ollama.calls[0]["options"] == {"temperature": 0.7}
+
+
+def test_keys_on_model_prompt_context_and_streaming(tmp_path, scripted_ollama):
+    path = tmp_path / "recording.jsonl"
+    record(path, scripted_ollama, [
+        ("plain", {"model": "m", "prompt": "p"}),
+        ("other model", {"model": "n", "prompt": "p"}),
+        ("with context", {"model": "m", "prompt": "p", "context": [1, 2, 3]}),
+        ("streamed", {"model": "m", "prompt": "p", "stream": True}),
+    ])
+
+    assert replay(path, model="m", prompt="p") == "plain"
+    assert replay(path, model="n", prompt="p") == "other model"
+    assert replay(path, model="m", prompt="p", context=[1, 2, 3]) == "with context"
+    assert replay(path, model="m", prompt="p", stream=True) == "streamed "
+    for kwargs in ({"model": "m", "prompt": "q"}, {"model": "m", "prompt": "p", "context": [1, 2]},
+                   {"model": "n", "prompt": "p", "stream": True}):
+        with pytest.raises(ReplayMissError):
+            replay(path, **kwargs)
+
+
+def test_repeated_requests_get_their_responses_in_turn(tmp_path, scripted_ollama):
+    path = tmp_path / "recording.jsonl"
+    record(path, scripted_ollama, [("first", {"model": "m", "prompt": "p"}),
+                                   ("second", {"model": "m", "prompt": "p"})])
+
+    async def scenario():
+        transport = ReplayTransport(str(path), time_scale=0)
+        return [(await transport.generate(model="m", prompt="p")).response for _ in range(3)]
+
+    assert asyncio.run(scenario()) == ["first", "second", "first"]
+
+
+def test_records_timings_and_stream_chunks(tmp_path, scripted_ollama):
+    path = tmp_path / "recording.jsonl"
+    record(path, scripted_ollama, [("a b", {"model": "m", "prompt": "p", "stream": True})])
+
+    entry = orjson.loads(path.read_bytes().splitlines()[0])
+    assert entry["request"]["stream"] is True
+    assert entry["elapsed_ms"] >= 0
+    assert [chunk["response"] for chunk in entry["chunks"]] == ["a ", "b ", ""]
+    assert entry["chunks"][-1]["eval_count"] == 2
+    assert all("offset_ms" in chunk for chunk in entry["chunks"])
+
+
+def test_stream_stopped_early_is_recorded_up_to_there(tmp_path, scripted_ollama):
+    path = tmp_path / "recording.jsonl"
+    scripted_ollama.reply = "a b c"
+
+    async def scenario():
+        transport = RecordingTransport(str(path))
+        stream = await transport.wrap(scripted_ollama).generate(model="m", prompt="p", stream=True)
+        async for _ in stream:
+            break
+        await stream.aclose()
+        transport.close()
+
+    asyncio.run(scenario())
+
+    entry = orjson.loads(path.read_bytes().splitlines()[0])
+    assert [chunk["response"] for chunk in entry["chunks"]] == ["a "]
+
+
+def test_lists_recorded_models(tmp_path, scripted_ollama):
+    path = tmp_path / "recording.jsonl"
+    record(path, scripted_ollama, [("x", {"model": "b", "prompt": "p"}), ("x", {"model": "a", "prompt": "p"})])
+
+    listing = asyncio.run(ReplayTransport(str(path)).list())
+
+    assert [model.model for model in listing.models] == ["a", "b"]
+
+
+def test_create_transport(tmp_path):
+    path = tmp_path / "recording.jsonl"
+
+    recording = create_transport("RECORD", str(path), 1.0)
+    assert isinstance(recording, RecordingTransport)
+    recording.close()
+    assert isinstance(create_transport("replay", str(path), 1.0), ReplayTransport)
+    assert isinstance(create_transport("passthrough", str(path), 1.0), PassthroughTransport)
+    assert isinstance(create_transport("bogus", str(path), 1.0), PassthroughTransport)
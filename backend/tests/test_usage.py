@@ -0,0 +1,76 @@
+from conftest import SAFE_MESSAGE
+from usage import OTHER_CLIENTS, UsageTracker, api_caller, calls_for, current_caller
+
+
+def response(prompt_tokens: int = 10, output_tokens: int = 3, load_ms: float = 1.0) -> dict:
+    return {
+        "prompt_eval_count": prompt_tokens,
+        "eval_count": output_tokens,
+        "total_duration": 2_000_000_000,
+        "load_duration": int(load_ms * 1_000_000),
+        "prompt_eval_duration": 500_000_000,
+        "eval_duration": 1_000_000_000,
+    }
+
+
+def test_accounts_calls_to_the_current_caller():
+    tracker = UsageTracker(load_threshold=1.0, max_clients=10)
+
+    assert current_caller().endpoint == "internal"
+    with calls_for(api_caller("/api/emojis", "alice")):
+        tracker.record("m", response())
+        tracker.record("m", response(prompt_tokens=5))
+    tracker.record("m", response())
+
+    report = tracker.report()
+    assert report.totals.calls == 3
+    assert report.totals.prompt_tokens == 25
+    alice = next(group for group in report.groups if group.client == "alice")
+    assert (alice.endpoint, alice.model, alice.calls, alice.prompt_tokens) == ("/api/emojis", "m", 2, 15)
+    assert alice.eval_seconds == 2.0
+
+
+def test_groups_by_the_requested_dimensions():
+    tracker = UsageTracker(load_threshold=1.0, max_clients=10)
+    for endpoint, client in (("/api/emojis", "a"), ("/api/emojis", "b"), ("/api/sample", "a")):
+        with calls_for(api_caller(endpoint, client)):
+            tracker.record("m", response())
+
+    groups = tracker.report(group_by=["endpoint"]).groups
+
+    assert [(group.endpoint, group.client, group.calls) for group in groups] == [
+        ("/api/emojis", None, 2), ("/api/sample", None, 1)
+    ]
+
+
+def test_clients_over_the_limit_count_as_other():
+    tracker = UsageTracker(load_threshold=1.0, max_clients=1)
+    for client in ("first", "second", "third"):
+        with calls_for(api_caller("/api/emojis", client)):
+            tracker.record("m", response())
+
+    clients = {group.client: group.calls for group in tracker.report(group_by=["client"]).groups}
+
+    assert clients == {"first": 1, OTHER_CLIENTS: 2}
+
+
+def test_flags_calls_that_loaded_the_model():
+    tracker = UsageTracker(load_threshold=1.0, max_clients=10)
+
+    assert tracker.record("m", response(load_ms=1)) is False
+    assert tracker.record("m", response(load_ms=2500)) is True
+
+    report = tracker.report()
+    assert report.totals.model_loads == 1
+    assert [(load.model, load.load_seconds) for load in report.recent_model_loads] == [("m", 2.5)]
+
+
+def test_usage_is_accounted_by_client(client, use_llm_client):
+    client.post("/api/emojis", json={"message": SAFE_MESSAGE}, headers={"X-Client-Id": "usage-test"})
+
+    groups = client.get("/api/usage", params={"group_by": ["endpoint", "client"]}).json()["groups"]
+    usage = next(group for group in groups if group["client"] == "usage-test")
+    assert usage["endpoint"] == "/api/emojis"
+    # Moderation and emoji generation
+    assert usage["calls"] == 2
+    assert usage["prompt_tokens"] > 0
@@ -0,0 +1,82 @@
+"""Chat WebSocket tests against a replayed LLM recording, see conftest."""
+
+from conftest import SAFE_MESSAGE, SAFE_EMOJIS, UNSAFE_MESSAGE, UNSAFE_REASON, UNRECORDED_MESSAGE
+from heuristic_emojis import heuristic_emojis
+
+
+def receive_until_done(websocket, message_id: str) -> list:
+    frames = []
+    while True:
+        frame = websocket.receive_json()
+        assert frame["id"] == message_id
+        frames.append(frame)
+        if frame["type"] in ("result", "error"):
+            return frames
+
+
+def test_session_frame_announces_limits(client, use_llm_client):
+    with client.websocket_connect("/api/ws") as websocket:
+        frame = websocket.receive_json()
+
+    assert frame["type"] == "session"
+    assert frame["max_concurrent"] >= 1 and frame["max_pending"] >= 1
+
+
+def test_streams_emojis(client, use_llm_client):
+    with client.websocket_connect("/api/ws") as websocket:
+        websocket.receive_json()
+        websocket.send_json({"id": "m1", "message": SAFE_MESSAGE})
+
+        frames = receive_until_done(websocket, "m1")
+
+    assert [frame["type"] for frame in frames] == ["accepted"] + ["emoji"] * len(SAFE_EMOJIS) + ["result"]
+    assert [frame["emoji"] for frame in frames[1:-1]] == SAFE_EMOJIS
+    assert frames[-1] == {"type": "result", "id": "m1", "emojis": SAFE_EMOJIS, "message": SAFE_MESSAGE,
+                          "moderation_passed": True, "degraded": False}
+
+
+def test_pipelines_several_messages(client, use_llm_client):
+    with client.websocket_connect("/api/ws") as websocket:
+        websocket.receive_json()
+        for message_id in ("a", "b", "c"):
+            websocket.send_json({"id": message_id, "message": SAFE_MESSAGE, "disable_moderation": True})
+
+        results = {}
+        while len(results) < 3:
+            frame = websocket.receive_json()
+            if frame["type"] == "result":
+                results[frame["id"]] = frame["emojis"]
+
+    assert results == {"a": SAFE_EMOJIS, "b": SAFE_EMOJIS, "c": SAFE_EMOJIS}
+
+
+def test_reports_errors(client, use_llm_client):
+    with client.websocket_connect("/api/ws") as websocket:
+        websocket.receive_json()
+
+        websocket.send_text("not json")
+        assert websocket.receive_json() == {"type": "error", "id": None, "detail": "Invalid JSON"}
+
+        websocket.send_json({"id": "empty", "message": "  "})
+        frame = websocket.receive_json()
+        assert (frame["type"], frame["id"]) == ("error", "empty")
+
+        websocket.send_json({"id": "unsafe", "message": UNSAFE_MESSAGE})
+        frames = receive_until_done(websocket, "unsafe")
+        assert frames[-1]["detail"] == f"Message failed content moderation: {UNSAFE_REASON.upper()}"
+        assert "emoji" not in [frame["type"] for frame in frames]
+
+        websocket.send_json({"id": "unavailable", "message": UNRECORDED_MESSAGE})
+        frames = receive_until_done(websocket, "unavailable")
+        assert frames[-1]["detail"] == "Content moderation is temporarily unavailable, please try again later"
+
+
+def test_degrades_when_llm_fails(client, use_llm_client):
+    with client.websocket_connect("/api/ws") as websocket:
+        websocket.receive_json()
+        websocket.send_json({"id": "m1", "message": UNRECORDED_MESSAGE, "disable_moderation": True})
+
+        result = receive_until_done(websocket, "m1")[-1]
+
+    assert result["degraded"] is True
+    assert result["emojis"] == heuristic_emojis.suggest(UNRECORDED_MESSAGE)
@@ -2,7 +2,24 @@ import { MessageRequest, EmojiResponse, SampleResponse, ApiError } from '../type
 
 // No API_BASE_URL needed - use relative URLs to call the same host/port that served the frontend
 
+function randomHex(bytes: number): string {
+  const values = new Uint8Array(bytes);
+  crypto.getRandomValues(values);
+  return Array.from(values, value => value.toString(16).padStart(2, '0')).join('');
+}
+
+// W3C trace context header, so backend traces can be linked to the request that caused them
+function createTraceparent(): string {
+  return `00-${randomHex(16)}-${randomHex(8)}-01`;
+}
+
+// Conversation context is opt-in: without it, every message is handled on its own
+const CONVERSATION_CONTEXT = process.env.NEXT_PUBLIC_CONVERSATION_CONTEXT === 'true';
+
 class ApiService {
+  // With conversation context, messages from one page load share a conversation
+  private readonly sessionId = CONVERSATION_CONTEXT ? randomHex(16) : undefined;
+
   private async fetchWithErrorHandling<T>(
     url: string,
     options?: RequestInit
@@ -12,6 +29,7 @@ class ApiService {
         ...options,
         headers: {
           'Content-Type': 'application/json',
+          traceparent: createTraceparent(),
           ...options?.headers,
         },
       });
@@ -40,7 +58,8 @@ class ApiService {
   async generateEmojis(message: string, disableModeration: boolean = false): Promise<EmojiResponse> {
     const request: MessageRequest = {
       message,
-      disable_moderation: disableModeration
+      disable_moderation: disableModeration,
+      session_id: this.sessionId
     };
 
     return this.fetchWithErrorHandling<EmojiResponse>(
@@ -2,12 +2,14 @@
 export interface MessageRequest {
   message: string;
   disable_moderation?: boolean;
+  session_id?: string;
 }
 
 export interface EmojiResponse {
   emojis: string[];
   message: string;
   moderation_passed?: boolean;
+  degraded?: boolean;
 }
 
 export interface SampleResponse {